@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict
+
+from src.teachers_db import load_teachers_db
+from src.utils.synthetic_data import FacultyConfig, generate_faculty, write_faculty
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_mib": peak / 2**20,
+    }
+
+
+def prepare_cases(paths: list[str], cache_dir: str) -> dict[str, Callable[[], object]]:
+    db = load_teachers_db(paths, cache_dir=None)
+
+    def load_no_cache():
+        return load_teachers_db(paths, cache_dir=None)
+
+    def load_snapshot():
+        return load_teachers_db(paths, cache_dir=cache_dir)
+
+    def teacher_roles():
+        for teacher in db:
+            teacher.invalidate_cache()
+            teacher.roles
+
+    def consume(teachers):
+        for teacher in teachers:
+            teacher.roles
+            teacher.groups
+
+    def filter_by_group():
+        for group in db.get_all_groups():
+            consume(db.filter_by_group(group))
+
+    def filter_by_stream():
+        for stream in db.get_all_streams():
+            consume(db.filter_by_stream(stream))
+
+    def filter_by_speciality():
+        for spec in db.get_all_specialities():
+            consume(db.filter_by_speciality(spec))
+
+    def num_students_for():
+        for teacher in db:
+            for group in teacher.groups:
+                teacher.num_students_for_group(group)
+            for stream in teacher.streams:
+                teacher.num_students_for_stream(stream)
+            for spec in teacher.specialities:
+                teacher.num_students_for_spec(spec)
+            for year in teacher.enrollment_years:
+                teacher.num_students_for_enrollment_year(year)
+
+    def get_all():
+        list(db.get_all_groups())
+        list(db.get_all_streams())
+        list(db.get_all_specialities())
+
+    return {
+        "load_teachers_db": load_no_cache,
+        "load_teachers_db[snapshot]": load_snapshot,
+        "Teacher.roles": teacher_roles,
+        "filter_by_group": filter_by_group,
+        "filter_by_stream": filter_by_stream,
+        "filter_by_speciality": filter_by_speciality,
+        "num_students_for_*": num_students_for,
+        "get_all_*": get_all,
+    }
+
+
+def benchmark(cfg: FacultyConfig, scales: list[int], repeat: int, out_json: str):
+    results = []
+    for scale in scales:
+        scaled_cfg = cfg.scaled(scale)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = write_faculty(
+                generate_faculty(scaled_cfg), os.path.join(tmp_dir, "groups")
+            )
+            cases = prepare_cases(paths, os.path.join(tmp_dir, "cache"))
+            for name, func in cases.items():
+                stats = measure(func, repeat)
+                results.append({"scale": scale, "case": name, **stats})
+                print(
+                    f"x{scale:<4} {name:28} "
+                    f"min {stats['min_s'] * 1000:10.3f} ms  "
+                    f"median {stats['median_s'] * 1000:10.3f} ms  "
+                    f"peak {stats['peak_mib']:8.2f} MiB"
+                )
+
+    if out_json:
+        with open(out_json, "w") as file:
+            json.dump(
+                {"config": asdict(cfg), "results": results},
+                file,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Multipliers of the base synthetic faculty size",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timed runs of every case",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--out_json",
+        type=str,
+        required=False,
+        help="Path to json file where to save results",
+    )
+
+    args = parser.parse_args()
+
+    benchmark(
+        cfg=FacultyConfig(seed=args.seed),
+        scales=args.scales,
+        repeat=args.repeat,
+        out_json=args.out_json,
+    )
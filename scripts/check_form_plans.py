@@ -0,0 +1,102 @@
+import argparse
+import json
+import sys
+import time
+from typing import Optional
+
+from src.forms.fake_api import make_template_items
+from src.forms.form_model import FormModel, InvalidRequestError
+from src.forms.generation import (
+    Granularity,
+    build_adaptation_requests,
+    check_adapted_form,
+    template_layout,
+)
+from src.teachers_db import load_teachers_db
+from src.utils.cli_helpers import EnumAction, configure_logging
+
+
+def check_form_plans(
+    teacher_jsons: list[str],
+    template_json: Optional[str],
+    stats_granularity: Optional[Granularity],
+) -> bool:
+    """
+    Apply requests adapting the template for every teacher to a local model
+    of the form and check the result, without any API calls
+    """
+    if template_json:
+        with open(template_json, "r", encoding="utf-8") as file:
+            template = json.load(file)
+    else:
+        template = {
+            "info": {"title": "Template"},
+            "items": [
+                {**item, "itemId": f"{i:08x}"}
+                for i, item in enumerate(make_template_items())
+            ],
+        }
+    db = load_teachers_db(teacher_jsons)
+
+    start_time = time.perf_counter()
+    layout = template_layout(template)
+    num_forms = 0
+    num_requests = 0
+    num_failed = 0
+    for teacher in db:
+        requests = build_adaptation_requests(teacher, layout, stats_granularity)
+        form = FormModel(template)
+        try:
+            form.apply_all(requests)
+            problems = check_adapted_form(form.form, teacher, stats_granularity)
+        except InvalidRequestError as e:
+            problems = [str(e)]
+
+        num_forms += 1
+        num_requests += len(requests)
+        if problems:
+            num_failed += 1
+            print(f"{teacher.name}: {'; '.join(problems)}")
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"Checked {num_forms} forms ({num_requests} requests) "
+        f"in {1000 * elapsed:.1f} ms, {num_failed} with problems"
+    )
+    return num_failed == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--teacher_data",
+        nargs="+",
+        type=str,
+        required=True,
+        help="Paths to json files with teacher info",
+    )
+    parser.add_argument(
+        "--template_json",
+        type=str,
+        required=False,
+        help="Path to the template form as returned by forms.get "
+        "(default is the layout of the fake API template)",
+    )
+    parser.add_argument(
+        "--stats_granularity",
+        type=Granularity,
+        action=EnumAction,
+        required=False,
+        help="Specify the granularity level of optional question for statistics",
+    )
+
+    args = parser.parse_args()
+    configure_logging()
+
+    is_ok = check_form_plans(
+        teacher_jsons=args.teacher_data,
+        template_json=args.template_json,
+        stats_granularity=args.stats_granularity,
+    )
+    sys.exit(0 if is_ok else 1)
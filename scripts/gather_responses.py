@@ -1,17 +1,28 @@
 import argparse
 import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
+from typing import Optional
 
 import pandas as pd
+from googleapiclient.discovery import Resource
 from tqdm import tqdm
 
 from src.analysis.parsers import parse_bool, parse_nan_grade, parse_str
+from src.forms.batching import MAX_BATCH_SIZE
+from src.forms.fake_api import get_fake_services
 from src.forms.generation import Granularity, get_stats_question
-from src.forms.responses import gather_responses_to_pandas
+from src.forms.response_store import ResponseStore
+from src.forms.responses import batch_gather_responses_to_pandas
 from src.forms.services import (
     get_forms_service,
     get_gapi_credentials,
 )
+from src.forms.structure_cache import get_structure_cache
+from src.forms.telemetry import report_at_exit
 from src.teachers_db import Stream, load_teachers_db
+from src.utils.cli_helpers import add_fake_api_args, configure_logging
 
 columns_to_parser = {
     "Ввічливість і загальне враження від спілкування": parse_nan_grade,
@@ -39,11 +50,21 @@ def gather_responses(
     secrets_file: str,
     token_file: str,
     out_path: str,
+    response_store_path: Optional[str] = None,
+    workers: int = 1,
+    fake_services: Optional[tuple[Resource, Resource]] = None,
 ):
     db = load_teachers_db(teacher_jsons)
+    response_store = ResponseStore(response_store_path) if response_store_path else None
 
-    creds = get_gapi_credentials(cred_file=secrets_file, token_store_file=token_file)
-    forms_service = get_forms_service(creds)
+    if fake_services:
+        forms_service = fake_services[0]
+    else:
+        creds = get_gapi_credentials(
+            cred_file=secrets_file, token_store_file=token_file
+        )
+        # the service is shared by all workers: every one gets a connection
+        forms_service = get_forms_service(creds, pool_size=workers)
 
     with open(forms_json, "r", encoding="utf-8") as file:
         forms_info = json.load(file)
@@ -56,15 +77,30 @@ def gather_responses(
         stats_column = get_stats_question(stats_granularity)
         columns_to_parser[stats_column] = parse_str
 
+    def fetch_chunk(form_ids: list[str]) -> dict[str, pd.DataFrame]:
+        return batch_gather_responses_to_pandas(
+            form_ids,
+            forms_service,
+            columns_to_parser,
+            response_store,
+        )
+
+    form_ids = [form["form_id"] for forms in forms_dict.values() for form in forms]
+    # split forms between workers but keep chunks not larger than one batch
+    chunk_size = min(MAX_BATCH_SIZE, max(1, math.ceil(len(form_ids) / workers)))
+    chunks = [list(chunk) for chunk in batched(form_ids, chunk_size)]
+
+    form_dfs: dict[str, pd.DataFrame] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map keeps the order of chunks, so the output doesn't depend on workers
+        for chunk_dfs in tqdm(executor.map(fetch_chunk, chunks), total=len(chunks)):
+            form_dfs.update(chunk_dfs)
+
     df = pd.DataFrame()
-    for name, forms in tqdm(forms_dict.items()):
+    for name, forms in forms_dict.items():
         overall_role = db[name].overall_role
         for form in forms:
-            form_id = form["form_id"]
-
-            teacher_df = gather_responses_to_pandas(
-                form_id, forms_service, columns_to_parser
-            )
+            teacher_df = form_dfs[form["form_id"]]
             if len(teacher_df) == 0:
                 continue
 
@@ -151,8 +187,49 @@ if __name__ == "__main__":
         default="survey_results.parquet",
         help="Path to parquet file with all responses",
     )
+    parser.add_argument(
+        "--response_store",
+        type=str,
+        required=False,
+        help="Path to SQLite file where to keep responses between runs "
+        "(only new responses are downloaded)",
+    )
+    parser.add_argument(
+        "--revalidate_structures",
+        action="store_true",
+        help="Check revisions of forms in the structure cache and refetch "
+        "changed ones (also enabled by FORM_STRUCTURE_REVALIDATE=1)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads which fetch forms concurrently",
+    )
+    parser.add_argument(
+        "--telemetry_json",
+        type=str,
+        required=False,
+        help="Where to save Google API telemetry "
+        "(default .cache/telemetry/gather_responses.json)",
+    )
+
+    add_fake_api_args(parser)
 
     args = parser.parse_args()
+    configure_logging()
+    report_at_exit("gather_responses", args.telemetry_json)
+    if args.revalidate_structures:
+        get_structure_cache().revalidate = True
+
+    if args.fake_api:
+        fake_services = get_fake_services(
+            args.fake_latency,
+            args.fake_error_rate,
+            quota_scale=args.fake_quota_scale,
+        )
+    else:
+        fake_services = None
 
     gather_responses(
         teacher_jsons=args.teacher_data,
@@ -160,4 +237,7 @@ if __name__ == "__main__":
         secrets_file=args.secrets_file,
         token_file=args.token_file,
         out_path=args.out_path,
+        response_store_path=args.response_store,
+        workers=args.workers,
+        fake_services=fake_services,
     )
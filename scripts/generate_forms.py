@@ -1,20 +1,36 @@
 import argparse
 import json
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 
+from googleapiclient.discovery import Resource
 from pyparsing import Group
 from tqdm import tqdm
 
-from src.forms.generation import Granularity, adapt_form_from_template
-from src.forms.publishing import give_access_to_organization, publish_form
+from src.forms.batching import execute_batch
+from src.forms.fake_api import get_fake_services
+from src.forms.generation import (
+    Granularity,
+    adapt_form_from_template,
+    list_folder_files,
+)
+from src.forms.journal import FormsJournal, journal_key
+from src.forms.publishing import give_access_to_organizations, publish_form
 from src.forms.services import (
     get_drive_service,
     get_forms_service,
     get_gapi_credentials,
 )
-from src.teachers_db import Speciality, Stream, TeacherDB, load_teachers_db
-from src.utils.cli_helpers import EnumAction
+from src.forms.telemetry import report_at_exit
+from src.forms.template_variants import (
+    DEFAULT_VARIANTS_PATH,
+    TemplateVariants,
+    adapt_form_from_variant,
+)
+from src.teachers_db import Speciality, Stream, Teacher, TeacherDB, load_teachers_db
+from src.utils.cli_helpers import EnumAction, add_fake_api_args, configure_logging
 
 
 def prepare_funcs(db: TeacherDB, granularity: Granularity):
@@ -63,6 +79,94 @@ def prepare_funcs(db: TeacherDB, granularity: Granularity):
     return options_func, filter_func, metadata_func
 
 
+def create_form(
+    teacher: Teacher,
+    forms_service: Resource,
+    drive_service: Resource,
+    template_id: str,
+    dest_folder_id: str,
+    stats_granularity: Optional[Granularity],
+    variants: Optional[TemplateVariants] = None,
+    description: Optional[str] = None,
+) -> tuple[str, str]:
+    """Copy, adapt and publish the form of the teacher"""
+    if variants:
+        form_id, resp_url = adapt_form_from_variant(
+            teacher=teacher,
+            forms_service=forms_service,
+            drive_service=drive_service,
+            variants=variants,
+            dest_folder_id=dest_folder_id,
+            stats_granularity=stats_granularity,
+            description=description,
+        )
+    else:
+        form_id, resp_url = adapt_form_from_template(
+            teacher=teacher,
+            forms_service=forms_service,
+            drive_service=drive_service,
+            template_id=template_id,
+            dest_folder_id=dest_folder_id,
+            stats_granularity=stats_granularity,
+            description=description,
+        )
+    publish_with_access(form_id, forms_service, drive_service)
+    return form_id, resp_url
+
+
+def publish_with_access(
+    form_id: str, forms_service: Resource, drive_service: Resource
+) -> None:
+    publish_form(form_id=form_id, forms_service=forms_service)
+    give_access_to_organizations(
+        form_id=form_id,
+        drive_service=drive_service,
+        domains=["lll.kpi.ua", "edu.kpi.ua"],
+    )
+
+
+def find_adapted_orphans(
+    forms_service: Resource,
+    drive_service: Resource,
+    dest_folder_id: str,
+    keys: set[str],
+    known_form_ids: set[str],
+) -> dict[str, list[tuple[str, str]]]:
+    """
+    Forms left in the folder by an interrupted run which are missing in the
+    journal but already adapted: journal_key -> [(form_id, resp_url)]. The
+    key of the teacher/entity pair is stored in the file description when
+    the form is copied. Only publishing of such forms may be unfinished.
+    """
+    files = [
+        file
+        for file in list_folder_files(drive_service, dest_folder_id)
+        if file.get("description") in keys and file["id"] not in known_form_ids
+    ]
+    forms = execute_batch(
+        forms_service,
+        {
+            file["id"]: forms_service.forms().get(  # type: ignore
+                formId=file["id"], fields="info/title,responderUri"
+            )
+            for file in files
+        },
+    )
+
+    orphans: dict[str, list[tuple[str, str]]] = defaultdict(lambda: [])
+    for file in files:
+        form = forms[file["id"]]
+        # the title is set by the same batchUpdate which adapts the form
+        if form["info"]["title"] == file["name"]:
+            orphans[file["description"]].append((file["id"], form["responderUri"]))
+    num_reused = sum(len(found) for found in orphans.values())
+    print(
+        f"Reusing {num_reused} orphaned forms, "
+        f"{len(files) - num_reused} not adapted ones are left as is"
+    )
+    return orphans
+
+
 def generate_forms(
     teacher_jsons: list[str],
     template_id: str,
@@ -72,6 +176,14 @@ def generate_forms(
     secrets_file: str,
     token_file: str,
     out_path: str,
+    workers: int = 1,
+    use_variants: bool = False,
+    variants_path: Optional[str] = None,
+    journal_path: Optional[str] = None,
+    resume: bool = False,
+    reuse_orphans: bool = False,
+    overwrite_journal: bool = False,
+    fake_services: Optional[tuple[Resource, Resource]] = None,
 ):
     db = load_teachers_db(teacher_jsons)
 
@@ -80,32 +192,121 @@ def generate_forms(
 
     ops_func, filter_func, meta_func = prepare_funcs(db, granularity)
 
-    creds = get_gapi_credentials(cred_file=secrets_file, token_store_file=token_file)
-    forms_service = get_forms_service(creds)
-    drive_serive = get_drive_service(creds)
+    if fake_services:
+        forms_service, drive_serive = fake_services
+    else:
+        creds = get_gapi_credentials(
+            cred_file=secrets_file, token_store_file=token_file
+        )
+        # services are shared by all workers: every one gets a connection
+        forms_service = get_forms_service(creds, pool_size=workers)
+        drive_serive = get_drive_service(creds, pool_size=workers)
 
-    forms_dict: dict[str, list[dict[str, str]]] = defaultdict(lambda: [])
-    options = list(ops_func())
-    for option in tqdm(options):
-        for teacher in tqdm(filter_func(option)):
-            form_id, resp_url = adapt_form_from_template(
-                teacher=teacher,
-                forms_service=forms_service,
-                drive_service=drive_serive,
-                template_id=template_id,
-                dest_folder_id=dest_folder_id,
-                stats_granularity=stats_granularity,
+    variants = None
+    if use_variants:
+        variants = TemplateVariants(
+            template_id, dest_folder_id, forms_service, drive_serive, variants_path
+        )
+
+    jobs = [
+        (option, teacher) for option in ops_func() for teacher in filter_func(option)
+    ]
+
+    journal = FormsJournal(
+        journal_path or f"{out_path}.journal",
+        {
+            "template_id": template_id,
+            "dest_folder_id": dest_folder_id,
+            "granularity": granularity,
+            "stats_granularity": stats_granularity,
+        },
+    )
+    if resume:
+        done = journal.read()
+    else:
+        # the journal is the only record of forms already created in Drive
+        if journal.has_forms() and not overwrite_journal:
+            raise ValueError(
+                f"Journal {journal.path} has forms of a previous run, "
+                "pass --resume to continue it or --overwrite_journal to start over"
             )
-            publish_form(form_id=form_id, forms_service=forms_service)
-            give_access_to_organization(form_id=form_id, drive_service=drive_serive)
-            give_access_to_organization(
-                form_id=form_id, drive_service=drive_serive, domain="edu.kpi.ua"
+        journal.reset()
+        done = {}
+    pending = [
+        (option, teacher)
+        for option, teacher in jobs
+        if journal_key(teacher.name, meta_func(option)) not in done
+    ]
+
+    orphans: dict[str, list[tuple[str, str]]] = {}
+    if reuse_orphans:
+        orphans = find_adapted_orphans(
+            forms_service,
+            drive_serive,
+            dest_folder_id,
+            {
+                journal_key(teacher.name, meta_func(option))
+                for option, teacher in pending
+            },
+            {form_info["form_id"] for form_info in done.values()},
+        )
+
+    def make_form(option, teacher: Teacher):
+        key = journal_key(teacher.name, meta_func(option))
+        orphan = orphans[key].pop() if orphans.get(key) else None
+        if orphan:
+            form_id, resp_url = orphan
+            publish_with_access(form_id, forms_service, drive_serive)
+        else:
+            form_id, resp_url = create_form(
+                teacher,
+                forms_service,
+                drive_serive,
+                template_id,
+                dest_folder_id,
+                stats_granularity,
+                variants,
+                description=key,
             )
+        form_info = meta_func(option)
+        form_info["form_id"] = form_id
+        form_info["resp_url"] = resp_url
+        journal.append(teacher.name, form_info)
+        return form_info
 
-            form_info = meta_func(option)
-            form_info["form_id"] = form_id
-            form_info["resp_url"] = resp_url
-            forms_dict[teacher.name].append(form_info)
+    # every worker goes through all steps of one form, so copies of later
+    # forms overlap with updates and permissions of earlier ones
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(make_form, option, teacher) for option, teacher in pending
+        ]
+        try:
+            pbar = tqdm(as_completed(futures), total=len(futures), unit="form")
+            for num_done, future in enumerate(pbar, 1):
+                future.result()
+                forms_per_min = 60 * num_done / (time.perf_counter() - start_time)
+                pbar.set_postfix(forms_per_min=f"{forms_per_min:.1f}")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"Generated {len(pending)} forms in {elapsed:.1f} s "
+        f"({60 * len(pending) / max(elapsed, 1e-9):.1f} forms/min), "
+        f"{len(jobs) - len(pending)} taken from the journal"
+    )
+    for (_, teacher), future in zip(pending, futures):
+        form_info = future.result()
+        done[journal_key(teacher.name, form_info)] = form_info
+
+    # filled in the order of jobs, so it doesn't depend on workers
+    forms_dict: dict[str, list[dict[str, str]]] = defaultdict(lambda: [])
+    for option, teacher in jobs:
+        form_info = done[journal_key(teacher.name, meta_func(option))]
+        forms_dict[teacher.name].append(form_info)
 
     with open(out_path, "w") as file:
         forms_info = {
@@ -176,8 +377,72 @@ if __name__ == "__main__":
         required=True,
         help="Path to generated json file with links to forms",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of forms generated concurrently (default 1, sequential)",
+    )
+    parser.add_argument(
+        "--template_variants",
+        action="store_true",
+        help="Copy forms from templates pre-adapted for every role set "
+        "(created in the destination folder on first use)",
+    )
+    parser.add_argument(
+        "--variants_json",
+        type=str,
+        default=DEFAULT_VARIANTS_PATH,
+        help="Where to keep ids of the pre-adapted templates between runs",
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        required=False,
+        help="Where to record every generated form (default <out_path>.journal)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip forms already recorded in the journal by a previous run",
+    )
+    parser.add_argument(
+        "--overwrite_journal",
+        action="store_true",
+        help="Start over even if the journal has forms of a previous run "
+        "(they are generated again)",
+    )
+    parser.add_argument(
+        "--reuse_orphans",
+        action="store_true",
+        help="Publish already adapted forms found in the destination folder "
+        "but missing in the journal instead of generating them again",
+    )
+    parser.add_argument(
+        "--telemetry_json",
+        type=str,
+        required=False,
+        help="Where to save Google API telemetry "
+        "(default .cache/telemetry/generate_forms.json)",
+    )
+
+    add_fake_api_args(parser)
 
     args = parser.parse_args()
+    configure_logging()
+    report_at_exit("generate_forms", args.telemetry_json)
+
+    if args.fake_api:
+        fake_services = get_fake_services(
+            args.fake_latency,
+            args.fake_error_rate,
+            quota_scale=args.fake_quota_scale,
+        )
+        # forms of the fake don't outlive the process
+        variants_path = None
+    else:
+        fake_services = None
+        variants_path = args.variants_json
 
     generate_forms(
         teacher_jsons=args.teacher_data,
@@ -188,4 +453,12 @@ if __name__ == "__main__":
         secrets_file=args.secrets_file,
         token_file=args.token_file,
         out_path=args.out_path,
+        workers=args.workers,
+        use_variants=args.template_variants,
+        variants_path=variants_path,
+        journal_path=args.journal,
+        resume=args.resume,
+        reuse_orphans=args.reuse_orphans,
+        overwrite_journal=args.overwrite_journal,
+        fake_services=fake_services,
     )
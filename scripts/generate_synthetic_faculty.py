@@ -0,0 +1,63 @@
+import argparse
+
+from src.utils.synthetic_data import FacultyConfig, generate_faculty, write_faculty
+
+
+def generate_synthetic_faculty(cfg: FacultyConfig, scale: int, out_dir: str):
+    group_infos = generate_faculty(cfg.scaled(scale))
+    paths = write_faculty(group_infos, out_dir)
+    print(f"Generated {len(paths)} group files in {out_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    default_cfg = FacultyConfig()
+
+    parser.add_argument(
+        "--out_dir",
+        type=str,
+        required=True,
+        help="Directory where to save generated json files with group info",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=1,
+        help="Multiplier for the number of groups, teachers and courses",
+    )
+    parser.add_argument("--num_groups", type=int, default=default_cfg.num_groups)
+    parser.add_argument("--num_teachers", type=int, default=default_cfg.num_teachers)
+    parser.add_argument("--num_courses", type=int, default=default_cfg.num_courses)
+    parser.add_argument(
+        "--teachers_per_group", type=int, default=default_cfg.teachers_per_group
+    )
+    parser.add_argument(
+        "--max_courses_per_teacher",
+        type=int,
+        default=default_cfg.max_courses_per_teacher,
+    )
+    parser.add_argument(
+        "--elective_fraction", type=float, default=default_cfg.elective_fraction
+    )
+    parser.add_argument(
+        "--role_weights",
+        type=float,
+        nargs=3,
+        default=default_cfg.role_weights,
+        help="Weights of lecturer, practice and both roles",
+    )
+    parser.add_argument("--seed", type=int, default=default_cfg.seed)
+
+    args = parser.parse_args()
+
+    cfg = FacultyConfig(
+        num_groups=args.num_groups,
+        num_teachers=args.num_teachers,
+        num_courses=args.num_courses,
+        teachers_per_group=args.teachers_per_group,
+        max_courses_per_teacher=args.max_courses_per_teacher,
+        elective_fraction=args.elective_fraction,
+        role_weights=tuple(args.role_weights),
+        seed=args.seed,
+    )
+    generate_synthetic_faculty(cfg=cfg, scale=args.scale, out_dir=args.out_dir)
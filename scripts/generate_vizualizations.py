@@ -5,6 +5,7 @@ import pandas as pd
 from PIL import Image, ImageFont
 
 from src.teachers_db import Role, Teacher, load_teachers_db
+from src.utils.cli_helpers import configure_logging
 from src.viz.bar_plot import generate_bar_plot
 from src.viz.radar_plot import generate_radar_plot
 from src.viz.survey_image import generate_survey_result_picture
@@ -233,6 +234,7 @@ if __name__ == "__main__":
     parser.add_argument("--save_dir", required=True, type=str)
 
     args = parser.parse_args()
+    configure_logging()
 
     generate_vizualizations(
         teacher_jsons=args.teacher_data,
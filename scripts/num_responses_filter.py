@@ -6,6 +6,7 @@ from src.analysis.filters import (
     num_responses_filter,
 )
 from src.teachers_db import load_teachers_db
+from src.utils.cli_helpers import configure_logging
 
 
 def main(teacher_jsons: list[str], df_path: str, out_path: str):
@@ -46,4 +47,5 @@ if __name__ == "__main__":
     parser.add_argument("--out_path", required=True, type=str)
 
     args = parser.parse_args()
+    configure_logging()
     main(args.teacher_data, args.df_path, args.out_path)
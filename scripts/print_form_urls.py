@@ -6,7 +6,7 @@ from typing import Optional
 from src.forms.filtering import fitler_forms_info_by_granularity, form_gran_info_to_str
 from src.forms.generation import Granularity
 from src.teachers_db import Group, Speciality, Stream, load_teachers_db
-from src.utils.cli_helpers import EnumAction, ParseStreamAction
+from src.utils.cli_helpers import EnumAction, ParseStreamAction, configure_logging
 
 
 def print_urls(
@@ -73,6 +73,7 @@ if __name__ == "__main__":
     granularity_group.add_argument("--faculty", action="store_true")
 
     args = parser.parse_args()
+    configure_logging()
 
     print_urls_func = partial(
         print_urls,
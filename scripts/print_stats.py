@@ -1,20 +1,24 @@
 import argparse
 import json
 from functools import partial
+from itertools import batched
 from typing import Optional
 
 from tqdm import tqdm
 
+from src.forms.batching import MAX_BATCH_SIZE
 from src.forms.filtering import (
     form_info_to_query,
     get_granularity_filter_func,
     get_max_student_for_granularity,
 )
 from src.forms.generation import Granularity
-from src.forms.responses import get_num_responses
+from src.forms.responses import batch_get_num_responses
 from src.forms.services import get_forms_service, get_gapi_credentials
+from src.forms.structure_cache import get_structure_cache
+from src.forms.telemetry import report_at_exit
 from src.teachers_db import Group, Speciality, Stream, load_teachers_db
-from src.utils.cli_helpers import EnumAction, ParseStreamAction
+from src.utils.cli_helpers import EnumAction, ParseStreamAction, configure_logging
 
 
 def print_stats(
@@ -46,7 +50,26 @@ def print_stats(
             query=query,
             db=db,
         )
-    for teacher_name, forms in tqdm(forms_dict.items()):
+    selected_forms = []
+    for teacher_name, forms in forms_dict.items():
+        if granularity:
+            teacher_forms = [form for form in forms if filter_func(teacher_name, form)]
+        elif teacher_name == query:
+            teacher_forms = forms
+        else:
+            teacher_forms = []
+
+        selected_forms.extend(form["form_id"] for form in teacher_forms)
+        if teacher_forms and not print_all:
+            break
+
+    form_responses_map = {}
+    for chunk in tqdm(list(batched(selected_forms, MAX_BATCH_SIZE))):
+        form_responses_map.update(
+            batch_get_num_responses(dict.fromkeys(chunk), forms_service)
+        )
+
+    for teacher_name, forms in forms_dict.items():
         num_responses = 0
         do_print = False
 
@@ -57,17 +80,13 @@ def print_stats(
             for form in forms:
                 if filter_func(teacher_name, form):
                     do_print = True
-                    form_responses, _ = get_num_responses(
-                        form["form_id"], forms_service=forms_service
-                    )
+                    form_responses, _ = form_responses_map[form["form_id"]]
                     num_responses += form_responses
         elif teacher_name == query:
             do_print = True
             max_num_responses = db[teacher_name].num_students
             for form in forms:
-                form_responses, _ = get_num_responses(
-                    form["form_id"], forms_service=forms_service
-                )
+                form_responses, _ = form_responses_map[form["form_id"]]
                 num_responses += form_responses
 
                 if forms_granularity < Granularity.FACULTY:
@@ -136,7 +155,25 @@ if __name__ == "__main__":
     granularity_group.add_argument("--all", action="store_true")
     granularity_group.add_argument("--name", type=str)
 
+    parser.add_argument(
+        "--revalidate_structures",
+        action="store_true",
+        help="Check revisions of forms in the structure cache and refetch "
+        "changed ones (also enabled by FORM_STRUCTURE_REVALIDATE=1)",
+    )
+    parser.add_argument(
+        "--telemetry_json",
+        type=str,
+        required=False,
+        help="Where to save Google API telemetry "
+        "(default .cache/telemetry/print_stats.json)",
+    )
+
     args = parser.parse_args()
+    configure_logging()
+    report_at_exit("print_stats", args.telemetry_json)
+    if args.revalidate_structures:
+        get_structure_cache().revalidate = True
 
     print_func = partial(
         print_stats,
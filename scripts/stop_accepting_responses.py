@@ -1,13 +1,12 @@
 import argparse
 import json
 
-from tqdm import tqdm
-
-from src.forms.publishing import stop_accepting_responses
+from src.forms.publishing import batch_stop_accepting_responses
 from src.forms.services import (
     get_forms_service,
     get_gapi_credentials,
 )
+from src.forms.telemetry import report_at_exit
 
 
 def stop_accepting(
@@ -21,11 +20,8 @@ def stop_accepting(
     with open(forms_json, "r", encoding="utf-8") as file:
         forms_dict: dict[str, list[dict[str, str]]] = json.load(file)["forms"]
 
-    for _, forms in tqdm(forms_dict.items()):
-        for form in forms:
-            stop_accepting_responses(
-                form_id=form["form_id"], forms_service=forms_service
-            )
+    form_ids = [form["form_id"] for forms in forms_dict.values() for form in forms]
+    batch_stop_accepting_responses(form_ids=form_ids, forms_service=forms_service)
 
 
 if __name__ == "__main__":
@@ -49,8 +45,16 @@ if __name__ == "__main__":
         required=True,
         help="Where to save/reuse access token",
     )
+    parser.add_argument(
+        "--telemetry_json",
+        type=str,
+        required=False,
+        help="Where to save Google API telemetry "
+        "(default .cache/telemetry/stop_accepting_responses.json)",
+    )
 
     args = parser.parse_args()
+    report_at_exit("stop_accepting_responses", args.telemetry_json)
 
     stop_accepting(
         forms_json=args.forms_json,
@@ -1,10 +1,10 @@
 import json
 import math
+import os
 from argparse import ArgumentParser, Namespace
 from collections import defaultdict
 from typing import Callable, Iterable, Optional
 
-from googleapiclient.discovery import Resource
 from telegram import Update
 from telegram.ext import (
     AIORateLimiter,
@@ -14,6 +14,9 @@ from telegram.ext import (
     ContextTypes,
 )
 
+from src.bot.response_counts import FormCounts, ResponseCountsSnapshot, format_age
+from src.forms.async_client import AsyncFormsClient
+from src.forms.fake_api import get_fake_services
 from src.forms.filtering import (
     fitler_forms_info_by_granularity,
     form_gran_info_to_str,
@@ -22,16 +25,23 @@ from src.forms.filtering import (
     get_max_student_for_granularity,
 )
 from src.forms.generation import Granularity
-from src.forms.responses import get_num_responses
-from src.forms.services import get_forms_service, get_gapi_credentials
+from src.forms.response_store import ResponseStore
+from src.forms.services import get_gapi_credentials
+from src.forms.structure_cache import get_structure_cache
+from src.forms.telemetry import get_telemetry
 from src.teachers_db import (
     Group,
     Speciality,
     Stream,
     Teacher,
     TeacherDB,
+    TeacherDBReloader,
     load_teachers_db,
+    reload_teachers_db,
 )
+from src.utils.cli_helpers import add_fake_api_args, configure_logging
+
+configure_logging()
 
 NO_FORMS_RESPONSE = "Жодної форми не знайдено"
 MIN_NUM_RESPONSE_TO_PUBLISH = 5
@@ -47,7 +57,10 @@ async def get_group_links(
     forms_dict: dict[str, list[dict[str, str]]] = context.bot_data["forms_dict"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
 
-    group = Group(context.args[0])
+    group = Group.lookup(context.args[0])
+    if group is None:
+        await reply_text(update, context, NO_FORMS_RESPONSE)
+        return
     for group in sorted(teachers_db.get_all_groups(), key=lambda g: g.name):
         forms_info = fitler_forms_info_by_granularity(
             db=teachers_db,
@@ -95,13 +108,17 @@ async def get_stream_links(
     forms_dict: dict[str, list[dict[str, str]]] = context.bot_data["forms_dict"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
 
-    spec, year = context.args[0].split("-")
+    spec, _, year = context.args[0].partition("-")
+    stream = Stream.lookup(spec, year)
+    if stream is None:
+        await reply_text(update, context, NO_FORMS_RESPONSE)
+        return
     forms_info = fitler_forms_info_by_granularity(
         db=teachers_db,
         forms_dict=forms_dict,
         forms_granularity=forms_granularity,
         requested_granularity=Granularity.STREAM,
-        query=Stream(Speciality(spec), year),
+        query=stream,
     )
     await send_links(
         update,
@@ -224,9 +241,12 @@ async def get_group_stats(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
-    query = Group(context.args[0])
+    query = Group.lookup(context.args[0])
+    if query is None:
+        await reply_text(update, context, NO_FORMS_RESPONSE)
+        return
     granularity = Granularity.GROUP
     filter_func = get_granularity_filter_func(
         form_granularity=forms_granularity,
@@ -239,7 +259,7 @@ async def get_group_stats(
         context,
         forms_dict,
         teachers_db,
-        forms_service,
+        forms_client,
         query,
         granularity,
         forms_granularity,
@@ -256,10 +276,13 @@ async def get_stream_stats(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
-    spec, year = context.args[0].split("-")
-    query = Stream(Speciality(spec), year)
+    spec, _, year = context.args[0].partition("-")
+    query = Stream.lookup(spec, year)
+    if query is None:
+        await reply_text(update, context, NO_FORMS_RESPONSE)
+        return
     granularity = Granularity.STREAM
     filter_func = get_granularity_filter_func(
         form_granularity=forms_granularity,
@@ -272,7 +295,7 @@ async def get_stream_stats(
         context,
         forms_dict,
         teachers_db,
-        forms_service,
+        forms_client,
         query,
         granularity,
         forms_granularity,
@@ -289,7 +312,7 @@ async def get_speciality_stats(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
     query = Speciality(context.args[0])
     granularity = Granularity.SPECIALITY
@@ -304,7 +327,7 @@ async def get_speciality_stats(
         context,
         forms_dict,
         teachers_db,
-        forms_service,
+        forms_client,
         query,
         granularity,
         forms_granularity,
@@ -321,7 +344,7 @@ async def get_all_stats(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
     query = None
     granularity = Granularity.FACULTY
@@ -336,7 +359,7 @@ async def get_all_stats(
         context,
         forms_dict,
         teachers_db,
-        forms_service,
+        forms_client,
         query,
         granularity,
         forms_granularity,
@@ -353,7 +376,7 @@ async def get_teacher_stats(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
     name = " ".join(context.args)
 
@@ -365,7 +388,7 @@ async def get_teacher_stats(
         context,
         forms_dict,
         teachers_db,
-        forms_service,
+        forms_client,
         None,
         None,
         forms_granularity,
@@ -379,13 +402,23 @@ async def send_stats_for_granularity(
     context: ContextTypes.DEFAULT_TYPE,
     forms_dict: dict[str, list[dict[str, str]]],
     teachers_db: TeacherDB,
-    forms_service: Resource,
+    forms_client: AsyncFormsClient,
     query: Optional[Group | Speciality | Stream],
     req_granularity: Optional[Granularity],
     forms_granularity: Granularity,
     stats_granularity: Optional[Granularity],
     filter_func: Callable[[str, dict[str, str]], bool],
 ):
+    form_teachers = {
+        form["form_id"]: teachers_db[teacher_name]
+        for teacher_name, forms in forms_dict.items()
+        for form in forms
+        if filter_func(teacher_name, form)
+    }
+    form_num_responses, age = await get_num_responses_for_forms(
+        context, forms_client, form_teachers, stats_granularity
+    )
+
     messages = []
     for teacher_name, forms in forms_dict.items():
         num_responses = 0
@@ -397,12 +430,7 @@ async def send_stats_for_granularity(
             if filter_func(teacher_name, form):
                 do_append = True
 
-                total_num_resp, stats_resp = get_num_responses(
-                    form["form_id"],
-                    forms_service=forms_service,
-                    stats_granularity=stats_granularity,
-                    teacher=teachers_db[teacher_name],
-                )
+                total_num_resp, stats_resp = form_num_responses[form["form_id"]]
 
                 if (
                     req_granularity != forms_granularity
@@ -460,11 +488,39 @@ async def send_stats_for_granularity(
             messages.append("---------")
 
     if messages:
+        if age is not None:
+            messages.append(snapshot_age_message(age))
         await reply_text(update, context, "\n".join(messages))
     else:
         await reply_text(update, context, NO_FORMS_RESPONSE)
 
 
+async def get_num_responses_for_forms(
+    context: ContextTypes.DEFAULT_TYPE,
+    forms_client: AsyncFormsClient,
+    form_teachers: dict[str, Teacher],
+    stats_granularity: Optional[Granularity],
+) -> tuple[FormCounts, Optional[float]]:
+    """
+    Numbers of responses from the snapshot together with its age or
+    requested directly from the API if snapshots are disabled
+    """
+    snapshot: Optional[ResponseCountsSnapshot] = context.bot_data["response_counts"]
+    if snapshot is None:
+        form_num_responses = await forms_client.batch_get_num_responses(
+            form_teachers, stats_granularity=stats_granularity
+        )
+        return form_num_responses, None
+
+    if not snapshot.has_forms(form_teachers):
+        await refresh_response_counts(context)
+    return snapshot.counts, snapshot.age()
+
+
+def snapshot_age_message(age: float) -> str:
+    return f"Дані оновлено {format_age(age)} тому"
+
+
 def get_satisfy_emoji(num_responses: int, percent: int):
     if num_responses < MIN_NUM_RESPONSE_TO_PUBLISH:
         emoji = "⛔️"
@@ -520,9 +576,12 @@ async def get_group_need(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
-    group = Group(context.args[0])
+    group = Group.lookup(context.args[0])
+    if group is None:
+        await reply_text(update, context, NO_FORMS_RESPONSE)
+        return
 
     def filter_func(teacher: Teacher) -> bool:
         return group in teacher.groups
@@ -532,7 +591,7 @@ async def get_group_need(
         context=context,
         forms_dict=forms_dict,
         teachers_db=teachers_db,
-        forms_service=forms_service,
+        forms_client=forms_client,
         forms_granularity=forms_granularity,
         stats_granularity=stats_granularity,
         requested_granularity=Granularity.GROUP,
@@ -549,10 +608,13 @@ async def get_stream_need(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
-    spec, year = context.args[0].split("-")
-    stream = Stream(Speciality(spec), year)
+    spec, _, year = context.args[0].partition("-")
+    stream = Stream.lookup(spec, year)
+    if stream is None:
+        await reply_text(update, context, NO_FORMS_RESPONSE)
+        return
 
     def filter_func(teacher: Teacher) -> bool:
         return stream in teacher.streams
@@ -562,7 +624,7 @@ async def get_stream_need(
         context=context,
         forms_dict=forms_dict,
         teachers_db=teachers_db,
-        forms_service=forms_service,
+        forms_client=forms_client,
         forms_granularity=forms_granularity,
         stats_granularity=stats_granularity,
         requested_granularity=Granularity.STREAM,
@@ -579,7 +641,7 @@ async def get_spec_need(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
     spec = Speciality(context.args[0])
 
@@ -591,7 +653,7 @@ async def get_spec_need(
         context=context,
         forms_dict=forms_dict,
         teachers_db=teachers_db,
-        forms_service=forms_service,
+        forms_client=forms_client,
         forms_granularity=forms_granularity,
         stats_granularity=stats_granularity,
         requested_granularity=Granularity.SPECIALITY,
@@ -608,7 +670,7 @@ async def get_all_need(
     teachers_db: TeacherDB = context.bot_data["teachers_db"]
     forms_granularity: Granularity = context.bot_data["forms_granularity"]
     stats_granularity: Optional[Granularity] = context.bot_data["stats_granularity"]
-    forms_service: Resource = context.bot_data["forms_service"]
+    forms_client: AsyncFormsClient = context.bot_data["forms_client"]
 
     def filter_func(teacher: Teacher) -> bool:
         return True
@@ -618,7 +680,7 @@ async def get_all_need(
         context=context,
         forms_dict=forms_dict,
         teachers_db=teachers_db,
-        forms_service=forms_service,
+        forms_client=forms_client,
         forms_granularity=forms_granularity,
         stats_granularity=stats_granularity,
         requested_granularity=Granularity.FACULTY,
@@ -633,7 +695,7 @@ async def sent_need_for_granularity(
     forms_dict: dict[str, list[dict[str, str]]],
     teachers_db: TeacherDB,
     teacher_filter_func: Callable[[Teacher], bool],
-    forms_service: Resource,
+    forms_client: AsyncFormsClient,
     forms_granularity: Granularity,
     stats_granularity: Optional[Granularity],
     requested_granularity: Granularity,
@@ -644,6 +706,16 @@ async def sent_need_for_granularity(
         forms_granularity, requested_granularity, query, teachers_db
     )
 
+    form_teachers = {
+        form_info["form_id"]: teachers_db[teacher_name]
+        for teacher_name, forms in forms_dict.items()
+        if teacher_filter_func(teachers_db[teacher_name])
+        for form_info in forms
+    }
+    form_num_responses, age = await get_num_responses_for_forms(
+        context, forms_client, form_teachers, stats_granularity
+    )
+
     for teacher_name, forms in forms_dict.items():
         teacher = teachers_db[teacher_name]
         if teacher_filter_func(teacher):
@@ -660,12 +732,7 @@ async def sent_need_for_granularity(
             query_related_tesponses = 0
             num_per_stats_entity: dict[str, int] = defaultdict(int)
             for form_info in forms:
-                total_num_resp, stats_resp = get_num_responses(
-                    form_info["form_id"],
-                    forms_service=forms_service,
-                    stats_granularity=stats_granularity,
-                    teacher=teacher,
-                )
+                total_num_resp, stats_resp = form_num_responses[form_info["form_id"]]
 
                 total_responses += total_num_resp
                 for k, v in stats_resp.items():
@@ -744,6 +811,8 @@ async def sent_need_for_granularity(
             need_messages.append("---------")
 
     if need_messages:
+        if age is not None:
+            need_messages.append(snapshot_age_message(age))
         await reply_text(update, context, "\n".join(need_messages))
     else:
         await reply_text(update, context, "Усі викладачі набрали достатньо відповідей!")
@@ -807,13 +876,50 @@ async def reply_text(
         )
 
 
+async def refresh_response_counts(context: ContextTypes.DEFAULT_TYPE):
+    snapshot: ResponseCountsSnapshot = context.bot_data["response_counts"]
+    forms_dict: dict[str, list[dict[str, str]]] = context.bot_data["forms_dict"]
+    teachers_db: TeacherDB = context.bot_data["teachers_db"]
+
+    form_teachers = {
+        form["form_id"]: teachers_db[teacher_name]
+        for teacher_name, forms in forms_dict.items()
+        for form in forms
+    }
+    await snapshot.refresh(
+        context.bot_data["forms_client"],
+        form_teachers,
+        context.bot_data["stats_granularity"],
+    )
+
+
+async def force_refresh(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+):
+    await refresh_response_counts(context)
+    snapshot: ResponseCountsSnapshot = context.bot_data["response_counts"]
+    await reply_text(update, context, snapshot_age_message(snapshot.age()))
+
+
+async def send_telemetry(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+):
+    await reply_text(update, context, get_telemetry().format_summary())
+
+
 def run_bot(
     token: str,
     teachers_db: TeacherDB,
-    forms_service: Resource,
+    forms_client: AsyncFormsClient,
     forms_dict: dict[str, list[dict[str, str]]],
     forms_granularity: Granularity,
     stats_granularity: Optional[Granularity],
+    teachers_db_reloader: Optional[TeacherDBReloader] = None,
+    reload_interval: int = 60,
+    response_counts: Optional[ResponseCountsSnapshot] = None,
+    snapshot_interval: int = 300,
 ):
     rate_limiter = AIORateLimiter()
     application = (
@@ -827,7 +933,18 @@ def run_bot(
     application.bot_data["teachers_db"] = teachers_db
     application.bot_data["forms_granularity"] = forms_granularity
     application.bot_data["stats_granularity"] = stats_granularity
-    application.bot_data["forms_service"] = forms_service
+    application.bot_data["forms_client"] = forms_client
+    application.bot_data["teachers_db_reloader"] = teachers_db_reloader
+    application.bot_data["response_counts"] = response_counts
+
+    if teachers_db_reloader:
+        application.job_queue.run_repeating(
+            reload_teachers_db, interval=reload_interval, first=reload_interval
+        )
+    if response_counts:
+        application.job_queue.run_repeating(
+            refresh_response_counts, interval=snapshot_interval, first=0
+        )
 
     # Links commands
     application.add_handler(CommandHandler("lgroup", get_group_links))
@@ -849,6 +966,10 @@ def run_bot(
     application.add_handler(CommandHandler("nspec", get_spec_need))
     application.add_handler(CommandHandler("nall", get_all_need))
 
+    if response_counts:
+        application.add_handler(CommandHandler("refresh", force_refresh))
+    application.add_handler(CommandHandler("telemetry", send_telemetry))
+
     application.run_polling()
 
 
@@ -862,19 +983,52 @@ def main(args: Namespace):
             stats_granularity = Granularity(stats_granularity)
 
     teachers_db = load_teachers_db(args.teacher_data)
+    if args.reload_interval > 0:
+        teachers_db_reloader = TeacherDBReloader(args.teacher_data, teachers_db)
+    else:
+        teachers_db_reloader = None
+
+    if args.revalidate_structures:
+        get_structure_cache().revalidate = True
 
-    creds = get_gapi_credentials(
-        cred_file=args.secrets_file, token_store_file=args.token_file
+    if args.fake_api:
+        creds = None
+        forms_service, _ = get_fake_services(
+            args.fake_latency,
+            args.fake_error_rate,
+            quota_scale=args.fake_quota_scale,
+        )
+    else:
+        creds = get_gapi_credentials(
+            cred_file=args.secrets_file, token_store_file=args.token_file
+        )
+        forms_service = None
+    if args.response_store:
+        response_store = ResponseStore(args.response_store)
+    else:
+        response_store = None
+    forms_client = AsyncFormsClient(
+        creds,
+        max_concurrency=args.max_concurrency,
+        response_store=response_store,
+        forms_service=forms_service,
     )
-    forms_service = get_forms_service(creds)
+    if args.snapshot_interval > 0:
+        response_counts = ResponseCountsSnapshot(args.snapshot_path)
+    else:
+        response_counts = None
 
     run_bot(
         token=args.token,
         teachers_db=teachers_db,
-        forms_service=forms_service,
+        forms_client=forms_client,
         forms_dict=forms_dict,
         forms_granularity=forms_granularity,
         stats_granularity=stats_granularity,
+        teachers_db_reloader=teachers_db_reloader,
+        reload_interval=args.reload_interval,
+        response_counts=response_counts,
+        snapshot_interval=args.snapshot_interval,
     )
 
 
@@ -911,6 +1065,44 @@ if __name__ == "__main__":
         required=True,
         help="TG Token",
     )
+    parser.add_argument(
+        "--reload_interval",
+        type=int,
+        default=60,
+        help="Interval in seconds to check teacher json files for changes (0 to disable)",
+    )
+    parser.add_argument(
+        "--response_store",
+        type=str,
+        required=False,
+        help="Path to SQLite file where to keep responses (only new are downloaded)",
+    )
+    parser.add_argument(
+        "--revalidate_structures",
+        action="store_true",
+        help="Check revisions of forms in the structure cache and refetch "
+        "changed ones (also enabled by FORM_STRUCTURE_REVALIDATE=1)",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent Google API requests",
+    )
+    parser.add_argument(
+        "--snapshot_interval",
+        type=int,
+        default=300,
+        help="Interval in seconds to refresh numbers of responses in the background "
+        "(0 to request them on every command)",
+    )
+    parser.add_argument(
+        "--snapshot_path",
+        type=str,
+        default=os.path.join(".cache", "response_counts.json"),
+        help="Where to save numbers of responses between restarts",
+    )
+    add_fake_api_args(parser)
 
     args = parser.parse_args()
     main(args)
@@ -21,7 +21,12 @@ from telegram.ext import (
     filters,
 )
 
-from src.teachers_db import TeacherDB, load_teachers_db
+from src.teachers_db import (
+    TeacherDB,
+    TeacherDBReloader,
+    load_teachers_db,
+    reload_teachers_db,
+)
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -215,6 +220,8 @@ def run_bot(
     col2emoji: dict[str, list[str] | str],
     persistent_state: PersistentState,
     prev_surveys_links: Optional[dict[str, list[dict[str, str]]]] = None,
+    teachers_db_reloader: Optional[TeacherDBReloader] = None,
+    reload_interval: int = 60,
 ):
     rate_limiter = AIORateLimiter(max_retries=10)
     application = (
@@ -236,11 +243,18 @@ def run_bot(
     application.bot_data["persistent_state"] = persistent_state
     application.bot_data["prev_surveys_links"] = prev_surveys_links
     application.bot_data["channel_id"] = channel_id
+    application.bot_data["teachers_db_reloader"] = teachers_db_reloader
 
     # Schedule posting every interval_min
     job_queue = application.job_queue
     schedule_posting(start_time, interval_min, job_queue, post_next_teacher_results)
 
+    # Pick up corrections of teacher json files without restart
+    if teachers_db_reloader:
+        job_queue.run_repeating(
+            reload_teachers_db, interval=reload_interval, first=reload_interval
+        )
+
     # Add comments to new posts
     channel_info = get_channel_info(channel_id, application.bot)
     channel_post_handler = MessageHandler(
@@ -278,6 +292,13 @@ def main(args: Namespace):
 
     df = pd.read_parquet(cfg["survey_results"])
     teachers_db = load_teachers_db(cfg["teachers_info_files"])
+    reload_interval = cfg.get("teachers_reload_interval", 60)
+    if reload_interval > 0:
+        teachers_db_reloader = TeacherDBReloader(
+            cfg["teachers_info_files"], teachers_db
+        )
+    else:
+        teachers_db_reloader = None
 
     if "prev_surveys_links" in cfg:
         with open(cfg["prev_surveys_links"]) as file:
@@ -303,6 +324,8 @@ def main(args: Namespace):
             cfg["working_hours"]["max"],
         ),
         prev_surveys_links=prev_surveys_links,
+        teachers_db_reloader=teachers_db_reloader,
+        reload_interval=reload_interval,
     )
 
 
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from src.forms.async_client import AsyncFormsClient
+from src.forms.generation import Granularity
+from src.teachers_db import Teacher
+
+logger = logging.getLogger(__name__)
+
+FormCounts = dict[str, tuple[int, dict[str, int]]]
+
+
+class ResponseCountsSnapshot:
+    """
+    Latest known numbers of responses (total and per stats entity) of every
+    form. The snapshot is refreshed in the background and saved to `path`,
+    so after a restart the bot can answer before the first refresh.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.counts: FormCounts = {}
+        self.updated_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    data = json.load(file)
+                counts = {
+                    form_id: (total, stats)
+                    for form_id, (total, stats) in data["counts"].items()
+                }
+                self.updated_at = data["updated_at"]
+                self.counts = counts
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("Ignoring response counts snapshot %s: %s", path, e)
+
+    def age(self) -> Optional[float]:
+        if self.updated_at is None:
+            return None
+        return time.time() - self.updated_at
+
+    def has_forms(self, form_ids) -> bool:
+        return all(form_id in self.counts for form_id in form_ids)
+
+    async def refresh(
+        self,
+        forms_client: AsyncFormsClient,
+        form_teachers: dict[str, Optional[Teacher]],
+        stats_granularity: Optional[Granularity],
+    ) -> None:
+        if self._lock.locked():
+            # refresh is already in progress, so just wait for it
+            async with self._lock:
+                return
+
+        async with self._lock:
+            results = await forms_client.batch_get_num_responses(
+                form_teachers,
+                stats_granularity=stats_granularity,
+                return_exceptions=True,
+            )
+            counts: FormCounts = {}
+            failed = []
+            for form_id, result in results.items():
+                if not isinstance(result, BaseException):
+                    counts[form_id] = result
+                    continue
+                failed.append(form_id)
+                logger.warning("Failed to refresh responses of %s: %r", form_id, result)
+                # the previous count is better than none
+                if form_id in self.counts:
+                    counts[form_id] = self.counts[form_id]
+            if failed:
+                logger.warning(
+                    "%d of %d forms failed to refresh, previous counts are kept",
+                    len(failed),
+                    len(results),
+                )
+            self.counts = counts
+            self.updated_at = time.time()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.__dump)
+
+    def __dump(self) -> None:
+        if not self.path:
+            return
+
+        data = {
+            "updated_at": self.updated_at,
+            "counts": self.counts,
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def format_age(age: float) -> str:
+    if age < 60:
+        return f"{int(age)} с"
+    if age < 3600:
+        return f"{int(age // 60)} хв"
+    return f"{int(age // 3600)} год {int(age % 3600 // 60)} хв"
@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, TypeVar
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import Resource
+
+from src.forms.generation import Granularity
+from src.forms.response_store import ResponseStore
+from src.forms.responses import (
+    RESPONSES_PAGE_SIZE,
+    ResponseCounter,
+    count_fields,
+    get_stats_question_id,
+    get_timestamp_filter,
+    responses_list_request,
+)
+from src.forms.services import async_retry_google_api, get_forms_service
+from src.forms.structure_cache import get_structure_cache
+from src.teachers_db import Teacher
+
+T = TypeVar("T")
+
+
+class AsyncFormsClient:
+    """
+    Forms API access for asyncio code. Blocking googleapiclient calls run in
+    a thread pool and at most `max_concurrency` requests are in flight over
+    all callers.
+    """
+
+    def __init__(
+        self,
+        credentials: Optional[Credentials],
+        max_concurrency: int = 8,
+        response_store: Optional[ResponseStore] = None,
+        page_size: int = RESPONSES_PAGE_SIZE,
+        forms_service: Optional[Resource] = None,
+    ):
+        if forms_service is None:
+            # pooled transport with a connection for every concurrent request
+            forms_service = get_forms_service(credentials, max_concurrency)
+        self.forms_service = forms_service
+        self.response_store = response_store
+        self.page_size = page_size
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, func: Callable[[Resource], T]) -> T:
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, self.forms_service)
+
+    @async_retry_google_api()
+    async def get_responses_page(
+        self,
+        form_id: str,
+        page_token: Optional[str] = None,
+        timestamp_filter: Optional[str] = None,
+        fields: Optional[str] = None,
+    ) -> dict[str, Any]:
+        return await self._run(
+            lambda service: responses_list_request(
+                form_id, service, self.page_size, page_token, timestamp_filter, fields
+            ).execute()
+        )
+
+    async def fetch_responses(
+        self, form_id: str, fields: Optional[str] = None
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Yield response pages of the form as they are received or, with the
+        store, read from it after the synchronization. Partial responses
+        (`fields`) are requested only without the store.
+        """
+        store = self.response_store
+        if store:
+            fields = None
+        timestamp_filter = get_timestamp_filter(form_id, store)
+
+        loop = asyncio.get_running_loop()
+        page_token = None
+        while True:
+            page = await self.get_responses_page(
+                form_id, page_token, timestamp_filter, fields
+            )
+            if "responses" in page:
+                if store:
+                    await loop.run_in_executor(
+                        None, store.upsert, form_id, page["responses"]
+                    )
+                else:
+                    yield page["responses"]
+
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+
+        if store:
+            stored_pages = store.iter_responses(form_id, self.page_size)
+            while responses := await loop.run_in_executor(
+                None, next, stored_pages, None
+            ):
+                yield responses
+
+    async def get_question_map(self, form_id: str) -> dict[str, str]:
+        structure_cache = get_structure_cache()
+        return await self._run(
+            lambda service: structure_cache.get_question_map(form_id, service)
+        )
+
+    async def get_num_responses(
+        self,
+        form_id: str,
+        stats_granularity: Optional[Granularity] = None,
+        teacher: Optional[Teacher] = None,
+    ) -> tuple[int, dict[str, int]]:
+        id2q = await self.get_question_map(form_id) if stats_granularity else {}
+        fields = count_fields(get_stats_question_id(id2q, stats_granularity))
+        counter = ResponseCounter(id2q, stats_granularity, teacher)
+        async for responses in self.fetch_responses(form_id, fields):
+            counter.add(responses)
+        return counter.result()
+
+    async def batch_get_num_responses(
+        self,
+        form_teachers: dict[str, Optional[Teacher]],
+        stats_granularity: Optional[Granularity] = None,
+        return_exceptions: bool = False,
+    ) -> dict[str, tuple[int, dict[str, int]] | BaseException]:
+        """
+        get_num_responses for every form_id -> teacher fetched concurrently.
+        With `return_exceptions` errors of failed forms are returned as their
+        results instead of being raised.
+        """
+        results = await asyncio.gather(
+            *(
+                self.get_num_responses(form_id, stats_granularity, teacher)
+                for form_id, teacher in form_teachers.items()
+            ),
+            return_exceptions=return_exceptions,
+        )
+        return dict(zip(form_teachers, results))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
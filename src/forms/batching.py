@@ -0,0 +1,89 @@
+import time
+from itertools import batched
+from typing import Any
+
+from googleapiclient.discovery import Resource
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from src.forms.rate_limit import Quota, get_rate_scheduler
+from src.forms.services import retry_delay
+from src.forms.telemetry import get_telemetry
+
+# Maximum number of calls in one batch request supported by Drive and Forms
+MAX_BATCH_SIZE = 100
+
+
+def execute_batch(
+    service: Resource,
+    requests: dict[str, HttpRequest],
+    *,
+    batch_size: int = MAX_BATCH_SIZE,
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    retry_statuses: tuple[int, ...] = (429, 500, 503),
+    quota: Quota = Quota.FORMS_READ,
+) -> dict[str, Any]:
+    """
+    Execute requests to the same service grouped into batch HTTP requests
+    of at most `batch_size` calls. Every call is paced by the rate scheduler
+    and every failed sub-request is retried with the same policy as in
+    retry_google_api. Returns responses by request id.
+    """
+    telemetry = get_telemetry()
+    results: dict[str, Any] = {}
+    pending = dict(requests)
+    for attempt in range(retries):
+        failed: dict[str, HttpError] = {}
+
+        def callback(request_id: str, response: Any, exception: Exception):
+            if exception is None:
+                results[request_id] = response
+            elif isinstance(exception, HttpError):
+                failed[request_id] = exception
+            else:
+                raise exception
+
+        for chunk in batched(pending.items(), batch_size):
+            # every call in a batch is counted separately against the quota
+            get_rate_scheduler().acquire(quota, len(chunk))
+            batch = service.new_batch_http_request(callback=callback)  # type: ignore
+            for request_id, request in chunk:
+                batch.add(request, request_id=request_id)
+            error_status = None
+            start = time.perf_counter()
+            try:
+                batch.execute()
+            except HttpError as e:
+                error_status = getattr(e.resp, "status", None)
+                for request_id, _ in chunk:
+                    if request_id not in results:
+                        failed.setdefault(request_id, e)
+            finally:
+                telemetry.record_call(
+                    "batch", time.perf_counter() - start, error_status=error_status
+                )
+                for _, request in chunk:
+                    telemetry.record_batched(request.methodId)
+
+        for error in failed.values():
+            if getattr(error.resp, "status", None) not in retry_statuses:
+                raise error
+
+        if not failed:
+            break
+
+        if attempt == retries - 1:
+            raise next(iter(failed.values()))
+
+        for request_id, error in failed.items():
+            telemetry.record_retry(
+                requests[request_id].methodId, getattr(error.resp, "status", None)
+            )
+
+        error = next(iter(failed.values()))
+        time.sleep(retry_delay(error, quota, attempt, base_delay, max_delay))
+        pending = {request_id: requests[request_id] for request_id in failed}
+
+    return results
@@ -0,0 +1,462 @@
+import copy
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Any, Optional
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from src.forms.form_model import FormModel, InvalidRequestError
+from src.forms.rate_limit import RateScheduler, install_rate_scheduler, scaled_quotas
+from src.forms.telemetry import get_telemetry
+
+MAX_BATCH_SIZE = 100
+MAX_RESPONSES_PAGE_SIZE = 5000
+
+_general_questions = (
+    "Ввічливість і загальне враження від спілкування",
+    "Прозорість критеріїв оцінювання і їх дотримання",
+    "Доступність комунікації",
+    "Вимогливість викладача",
+)
+_open_questions = (
+    "Які позитивні риси є у викладача (такі, що можна порекомендувати іншим викладачам)?",
+    "Які недоліки є у викладанні?",
+)
+_section_questions = (
+    ("Питання тільки про практика", ("Ставлення викладача до перевірки робіт",)),
+    ("Питання тільки про лектора", ("Вміння донести матеріал до студентів",)),
+    (
+        "Питання про практика і лектора",
+        (
+            "Узгодженість лекцій і практик (наскільки курси лекцій і практик "
+            "доповнюють одне одного)",
+        ),
+    ),
+)
+
+
+def make_template_items() -> list[dict[str, Any]]:
+    """Items in the layout expected by adapt_form_from_template"""
+
+    def rating(title: str) -> dict[str, Any]:
+        return {
+            "title": title,
+            "questionItem": {
+                "question": {
+                    "required": True,
+                    "ratingQuestion": {"ratingScaleLevel": 5, "iconType": "STAR"},
+                }
+            },
+        }
+
+    def text(title: str) -> dict[str, Any]:
+        return {
+            "title": title,
+            "questionItem": {
+                "question": {"required": False, "textQuestion": {"paragraph": True}}
+            },
+        }
+
+    items = [rating(title) for title in _general_questions]
+    items.extend(text(title) for title in _open_questions)
+    for section_title, questions in _section_questions:
+        items.append({"title": section_title, "pageBreakItem": {"goToPage": "SUBMIT"}})
+        items.extend(rating(title) for title in questions)
+    return items
+
+
+def _http_error(status: int, message: str) -> HttpError:
+    content = json.dumps({"error": {"code": status, "message": message}})
+    return HttpError(httplib2.Response({"status": status}), content.encode())
+
+
+class FakeGoogleBackend:
+    """
+    In-memory state of Google Forms and Drive shared by fake services.
+    Every call sleeps for about `latency` seconds and fails with
+    probability `error_rate` (with 429 or 503). Unknown form ids are
+    created from the template layout with random responses, so existing
+    forms json files can be used as is.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        max_responses_per_form: int = 30,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_responses_per_form = max_responses_per_form
+        self.seed = seed
+        self.forms: dict[str, dict[str, Any]] = {}
+        self.responses: dict[str, list[dict[str, Any]]] = {}
+        self.permissions: dict[str, list[dict[str, Any]]] = {}
+        self.parents: dict[str, list[str]] = {}
+        self.descriptions: dict[str, str] = {}
+        self._ids = count()
+        self._rnd = random.Random(seed)
+        self._lock = threading.RLock()
+
+    def new_id(self) -> str:
+        with self._lock:
+            return f"{next(self._ids):08x}"
+
+    def delay(self) -> None:
+        if self.latency > 0:
+            with self._lock:
+                factor = self._rnd.uniform(0.5, 1.5)
+            time.sleep(self.latency * factor)
+
+    def maybe_fail(self) -> None:
+        with self._lock:
+            failed = self._rnd.random() < self.error_rate
+            status = self._rnd.choice((429, 503))
+        if failed:
+            raise _http_error(status, "Injected error")
+
+    def add_form(
+        self, items: list[dict[str, Any]], title: str, form_id: Optional[str] = None
+    ) -> str:
+        with self._lock:
+            form_id = form_id or self.new_id()
+            form = {
+                "formId": form_id,
+                "info": {"title": title, "documentTitle": title},
+                "items": [],
+                "revisionId": "00000001",
+                "responderUri": f"https://docs.google.com/forms/d/e/{form_id}/viewform",
+            }
+            for item in items:
+                form["items"].append(self.__with_ids(copy.deepcopy(item)))
+            self.forms[form_id] = form
+            self.responses[form_id] = []
+            return form_id
+
+    def get_form(self, form_id: str) -> dict[str, Any]:
+        with self._lock:
+            if form_id not in self.forms:
+                self.add_form(make_template_items(), "Template", form_id)
+                self.responses[form_id] = self.__random_responses(form_id)
+            return self.forms[form_id]
+
+    def __with_ids(self, item: dict[str, Any]) -> dict[str, Any]:
+        # copies keep ids of the template items as Drive does
+        item.setdefault("itemId", self.new_id())
+        if "questionItem" in item:
+            item["questionItem"]["question"].setdefault("questionId", self.new_id())
+        return item
+
+    def __random_responses(self, form_id: str) -> list[dict[str, Any]]:
+        rnd = random.Random(self.seed ^ zlib.crc32(form_id.encode()))
+        questions = [
+            (item["questionItem"]["question"]["questionId"], item)
+            for item in self.forms[form_id]["items"]
+            if "questionItem" in item
+        ]
+        start = datetime(2025, 5, 1, tzinfo=timezone.utc)
+
+        responses = []
+        for i in range(rnd.randint(0, self.max_responses_per_form)):
+            answers = {}
+            for question_id, item in questions:
+                question = item["questionItem"]["question"]
+                if "ratingQuestion" in question:
+                    value = str(rnd.randint(1, 5))
+                elif "choiceQuestion" in question:
+                    value = rnd.choice(question["choiceQuestion"]["options"])["value"]
+                else:
+                    value = f"Відповідь {i} на питання {item['title']}"
+                answers[question_id] = {
+                    "questionId": question_id,
+                    "textAnswers": {"answers": [{"value": value}]},
+                }
+            submitted = start + timedelta(minutes=i, seconds=rnd.randint(0, 59))
+            timestamp = submitted.isoformat(timespec="milliseconds")
+            timestamp = timestamp.replace("+00:00", "Z")
+            responses.append(
+                {
+                    "responseId": f"{form_id}-{i}",
+                    "createTime": timestamp,
+                    "lastSubmittedTime": timestamp,
+                    "answers": answers,
+                }
+            )
+        return responses
+
+
+class FakeRequest:
+    """Counterpart of googleapiclient HttpRequest"""
+
+    def __init__(
+        self,
+        backend: FakeGoogleBackend,
+        method_id: str,
+        func: Callable[[], Any],
+        body: Optional[dict[str, Any]] = None,
+    ):
+        self.backend = backend
+        self.methodId = method_id
+        self.func = func
+        self.body = json.dumps(body) if body is not None else None
+
+    def execute(self, http=None, num_retries=0) -> Any:
+        error_status = None
+        start = time.perf_counter()
+        try:
+            self.backend.delay()
+            return self.execute_now()
+        except HttpError as e:
+            error_status = e.resp.status
+            e.method_id = self.methodId
+            raise
+        finally:
+            get_telemetry().record_call(
+                self.methodId,
+                time.perf_counter() - start,
+                bytes_sent=len(self.body or ""),
+                error_status=error_status,
+            )
+
+    def execute_now(self) -> Any:
+        self.backend.maybe_fail()
+        with self.backend._lock:
+            result = self.func()
+        # round trip through json gives a copy and a realistic decoding cost
+        content = json.dumps(result, ensure_ascii=False)
+        get_telemetry().record_received(self.methodId, len(content.encode()))
+        return json.loads(content)
+
+
+class FakeBatchHttpRequest:
+    def __init__(self, backend: FakeGoogleBackend, callback: Callable):
+        self.backend = backend
+        self.callback = callback
+        self._requests: list[tuple[str, FakeRequest]] = []
+
+    def add(self, request: FakeRequest, callback=None, request_id=None) -> None:
+        if len(self._requests) >= MAX_BATCH_SIZE:
+            raise ValueError(f"Batch can't contain more than {MAX_BATCH_SIZE} calls")
+        self._requests.append((request_id or str(len(self._requests)), request))
+
+    def execute(self, http=None) -> None:
+        self.backend.delay()
+        for request_id, request in self._requests:
+            try:
+                response, exception = request.execute_now(), None
+            except HttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+def _apply_fields(responses: list[dict[str, Any]], fields: str) -> list[dict[str, Any]]:
+    """Partial response masks used for counting (see responses.count_fields)"""
+    if "responses/responseId" in fields:
+        return [{"responseId": resp["responseId"]} for resp in responses]
+
+    match = re.search(r"answers/([^/)]+)", fields)
+    masked = []
+    for resp in responses:
+        part = {"responseId": resp["responseId"]}
+        if match and match.group(1) in resp["answers"]:
+            part["answers"] = {match.group(1): resp["answers"][match.group(1)]}
+        masked.append(part)
+    return masked
+
+
+class FakeFormsService:
+    """Subset of the Forms API Resource used in src/forms"""
+
+    def __init__(self, backend: FakeGoogleBackend):
+        self.backend = backend
+
+    def forms(self) -> "FakeFormsService":
+        return self
+
+    def responses(self) -> "_FakeResponses":
+        return _FakeResponses(self.backend)
+
+    def new_batch_http_request(self, callback: Callable) -> FakeBatchHttpRequest:
+        return FakeBatchHttpRequest(self.backend, callback)
+
+    def get(self, formId: str, fields: Optional[str] = None) -> FakeRequest:
+        def get():
+            form = self.backend.get_form(formId)
+            if fields == "revisionId":
+                return {"revisionId": form["revisionId"]}
+            return form
+
+        return FakeRequest(self.backend, "forms.forms.get", get)
+
+    def batchUpdate(self, formId: str, body: dict[str, Any]) -> FakeRequest:
+        def batch_update():
+            form = self.backend.get_form(formId)
+            # the whole batch is applied atomically
+            model = FormModel(form, self.backend.new_id)
+            try:
+                replies = model.apply_all(body["requests"])
+            except InvalidRequestError as e:
+                raise _http_error(400, str(e))
+            updated = model.form
+            updated["revisionId"] = f"{int(form['revisionId'], 16) + 1:08x}"
+            self.backend.forms[formId] = updated
+
+            result = {"replies": replies}
+            if body.get("includeFormInResponse"):
+                result["form"] = updated
+            return result
+
+        return FakeRequest(self.backend, "forms.forms.batchUpdate", batch_update, body)
+
+    def setPublishSettings(self, formId: str, body: dict[str, Any]) -> FakeRequest:
+        def set_publish_settings():
+            form = self.backend.get_form(formId)
+            form["publishSettings"] = body["publishSettings"]
+            return {"formId": formId, "publishSettings": body["publishSettings"]}
+
+        return FakeRequest(
+            self.backend, "forms.forms.setPublishSettings", set_publish_settings, body
+        )
+
+
+class _FakeResponses:
+    def __init__(self, backend: FakeGoogleBackend):
+        self.backend = backend
+
+    def list(
+        self,
+        formId: str,
+        pageSize: int = MAX_RESPONSES_PAGE_SIZE,
+        pageToken: Optional[str] = None,
+        filter: Optional[str] = None,
+        fields: Optional[str] = None,
+    ) -> FakeRequest:
+        def list_responses():
+            self.backend.get_form(formId)
+            responses = self.backend.responses[formId]
+            if filter:
+                since = datetime.fromisoformat(filter.split(">=")[1].strip())
+                responses = [
+                    resp
+                    for resp in responses
+                    if datetime.fromisoformat(resp["lastSubmittedTime"]) >= since
+                ]
+
+            start = int(pageToken or 0)
+            end = start + min(pageSize, MAX_RESPONSES_PAGE_SIZE)
+            page = responses[start:end]
+            if fields:
+                page = _apply_fields(page, fields)
+
+            result = {}
+            if page:
+                result["responses"] = page
+            if end < len(responses):
+                result["nextPageToken"] = str(end)
+            return result
+
+        return FakeRequest(self.backend, "forms.forms.responses.list", list_responses)
+
+
+class FakeDriveService:
+    """Subset of the Drive API Resource used in src/forms"""
+
+    def __init__(self, backend: FakeGoogleBackend):
+        self.backend = backend
+
+    def files(self) -> "FakeDriveService":
+        return self
+
+    def permissions(self) -> "_FakePermissions":
+        return _FakePermissions(self.backend)
+
+    def new_batch_http_request(self, callback: Callable) -> FakeBatchHttpRequest:
+        return FakeBatchHttpRequest(self.backend, callback)
+
+    def copy(
+        self, fileId: str, body: dict[str, Any], supportsAllDrives: bool = False
+    ) -> FakeRequest:
+        def copy_file():
+            template = self.backend.get_form(fileId)
+            form_id = self.backend.add_form(
+                template["items"], template["info"]["title"]
+            )
+            self.backend.forms[form_id]["info"]["documentTitle"] = body["name"]
+            self.backend.parents[form_id] = body.get("parents", [])
+            if "description" in body:
+                self.backend.descriptions[form_id] = body["description"]
+            return {"id": form_id, "name": body["name"]}
+
+        return FakeRequest(self.backend, "drive.files.copy", copy_file, body)
+
+    def list(
+        self,
+        q: str,
+        fields: Optional[str] = None,
+        pageSize: int = 100,
+        pageToken: Optional[str] = None,
+        supportsAllDrives: bool = False,
+        includeItemsFromAllDrives: bool = False,
+    ) -> FakeRequest:
+        def list_files():
+            # only "'<folder_id>' in parents" queries are supported
+            folder_id = re.search(r"'([^']+)' in parents", q).group(1)  # type: ignore
+            files = [
+                {"id": form_id, "name": form["info"]["documentTitle"]}
+                for form_id, form in self.backend.forms.items()
+                if folder_id in self.backend.parents.get(form_id, [])
+            ]
+            for file in files:
+                if file["id"] in self.backend.descriptions:
+                    file["description"] = self.backend.descriptions[file["id"]]
+            start = int(pageToken) if pageToken else 0
+            end = start + pageSize
+            result: dict[str, Any] = {"files": files[start:end]}
+            if end < len(files):
+                result["nextPageToken"] = str(end)
+            return result
+
+        return FakeRequest(self.backend, "drive.files.list", list_files)
+
+
+class _FakePermissions:
+    def __init__(self, backend: FakeGoogleBackend):
+        self.backend = backend
+
+    def create(
+        self, fileId: str, body: dict[str, Any], supportsAllDrives: bool = False
+    ) -> FakeRequest:
+        def create_permission():
+            self.backend.get_form(fileId)
+            permission = {"id": self.backend.new_id(), **body}
+            self.backend.permissions.setdefault(fileId, []).append(permission)
+            return permission
+
+        return FakeRequest(
+            self.backend, "drive.permissions.create", create_permission, body
+        )
+
+
+def get_fake_services(
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    seed: int = 0,
+    quota_scale: float = 0.0,
+) -> tuple[FakeFormsService, FakeDriveService]:
+    """
+    Fake services sharing one backend. Calls are paced by the default API
+    quotas multiplied by `quota_scale` (zero disables pacing) instead of the
+    real ones.
+    """
+    install_rate_scheduler(RateScheduler(scaled_quotas(quota_scale)))
+    backend = FakeGoogleBackend(latency=latency, error_rate=error_rate, seed=seed)
+    return FakeFormsService(backend), FakeDriveService(backend)
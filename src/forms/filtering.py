@@ -119,10 +119,11 @@ def get_max_student_for_granularity(
     match granularity:
         case Granularity.GROUP:
             max_num_responses = teacher.num_students_for_group(query)
+        # one lookup in the matrix computed once for all teachers
         case Granularity.STREAM:
-            max_num_responses = teacher.num_students_for_stream(query)
+            max_num_responses = db.num_students_for(teacher_name, "stream", query)
         case Granularity.SPECIALITY:
-            max_num_responses = teacher.num_students_for_spec(query)
+            max_num_responses = db.num_students_for(teacher_name, "speciality", query)
         case Granularity.FACULTY:
             max_num_responses = teacher.num_students
 
@@ -0,0 +1,204 @@
+import copy
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from itertools import count
+from typing import Any, Optional
+
+
+class InvalidRequestError(ValueError):
+    pass
+
+
+class FormModel:
+    """
+    Local copy of a Google Form which applies batchUpdate requests with the
+    same index semantics as the Forms API: createItem inserts before the
+    index, moveItem's new location is the index in the resulting list and
+    every request sees the items as left by the previous one.
+    """
+
+    def __init__(
+        self, form: dict[str, Any], new_id: Optional[Callable[[], str]] = None
+    ):
+        self.form = copy.deepcopy(form)
+        self.form.setdefault("info", {})
+        self.form.setdefault("items", [])
+        if new_id is None:
+            ids = count()
+
+            def new_id() -> str:
+                return f"new{next(ids):04d}"
+
+        self.new_id = new_id
+
+    @property
+    def items(self) -> list[dict[str, Any]]:
+        return self.form["items"]
+
+    def item_ids(self) -> list[str]:
+        return [item["itemId"] for item in self.items]
+
+    def apply(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Apply one request in place and return its reply"""
+        (kind, params), *_ = request.items()
+        items = self.items
+        match kind:
+            case "updateFormInfo":
+                for key in params["updateMask"].split(","):
+                    if key in params["info"]:
+                        self.form["info"][key] = params["info"][key]
+                    else:
+                        self.form["info"].pop(key, None)
+                return {}
+            case "createItem":
+                index = params["location"]["index"]
+                if not 0 <= index <= len(items):
+                    raise InvalidRequestError(f"Invalid createItem index {index}")
+                item = copy.deepcopy(params["item"])
+                item["itemId"] = self.new_id()
+                reply = {"itemId": item["itemId"]}
+                if "questionItem" in item:
+                    question_id = self.new_id()
+                    item["questionItem"]["question"]["questionId"] = question_id
+                    reply["questionId"] = [question_id]
+                items.insert(index, item)
+                return {"createItem": reply}
+            case "moveItem":
+                orig = params["originalLocation"]["index"]
+                new = params["newLocation"]["index"]
+                if not (0 <= orig < len(items) and 0 <= new < len(items)):
+                    raise InvalidRequestError(f"Invalid moveItem indices {orig}, {new}")
+                items.insert(new, items.pop(orig))
+                return {}
+            case "deleteItem":
+                index = params["location"]["index"]
+                if not 0 <= index < len(items):
+                    raise InvalidRequestError(f"Invalid deleteItem index {index}")
+                del items[index]
+                return {}
+            case "updateItem":
+                index = params["location"]["index"]
+                if not 0 <= index < len(items):
+                    raise InvalidRequestError(f"Invalid updateItem index {index}")
+                for path in params["updateMask"].split(","):
+                    *parents, key = path.split(".")
+                    src, dst = params["item"], items[index]
+                    for parent in parents:
+                        src, dst = src[parent], dst.setdefault(parent, {})
+                    dst[key] = copy.deepcopy(src[key])
+                return {}
+            case _:
+                raise InvalidRequestError(f"Unsupported request {kind}")
+
+    def apply_all(self, requests: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        return [self.apply(request) for request in requests]
+
+
+def is_structural(request: dict[str, Any]) -> bool:
+    return "moveItem" in request or "deleteItem" in request
+
+
+def longest_increasing_subsequence(values: list[int]) -> list[int]:
+    # the smallest last value of increasing subsequences by length - 1
+    tails: list[int] = []
+    tail_indices: list[int] = []
+    prev: list[Optional[int]] = [None] * len(values)
+    for i, value in enumerate(values):
+        pos = bisect_left(tails, value)
+        prev[i] = tail_indices[pos - 1] if pos > 0 else None
+        if pos == len(tails):
+            tails.append(value)
+            tail_indices.append(i)
+        else:
+            tails[pos] = value
+            tail_indices[pos] = i
+
+    result = []
+    i = tail_indices[-1] if tail_indices else None
+    while i is not None:
+        result.append(values[i])
+        i = prev[i]
+    return result[::-1]
+
+
+def minimize_structural_run(
+    before: list[str], after: list[str]
+) -> list[dict[str, Any]]:
+    """
+    Fewest deleteItem and moveItem requests which turn items with ids
+    `before` into `after` (a subsequence of a permutation of `before`)
+    """
+    requests: list[dict[str, Any]] = []
+    current = list(before)
+    survivors = set(after)
+    # from the end, so indices of the remaining deletes don't change
+    for index in reversed(range(len(current))):
+        if current[index] not in survivors:
+            requests.append({"deleteItem": {"location": {"index": index}}})
+            del current[index]
+
+    # items in the longest run which already has the right order stay
+    positions = {item_id: i for i, item_id in enumerate(current)}
+    staying = {
+        current[pos]
+        for pos in longest_increasing_subsequence([positions[id] for id in after])
+    }
+    for target, item_id in enumerate(after):
+        if item_id in staying:
+            continue
+        orig = current.index(item_id)
+        current.pop(orig)
+        # right after the previous item which is already in its place
+        new = current.index(after[target - 1]) + 1 if target > 0 else 0
+        current.insert(new, item_id)
+        if orig != new:
+            requests.append(
+                {
+                    "moveItem": {
+                        "originalLocation": {"index": orig},
+                        "newLocation": {"index": new},
+                    }
+                }
+            )
+
+    assert current == after
+    return requests
+
+
+def minimize_requests(
+    form: dict[str, Any], requests: Iterable[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """
+    Equivalent list of requests where every sequence of moveItem and
+    deleteItem requests is replaced by the fewest ones. Raises
+    InvalidRequestError if the requests can't be applied to the form.
+    """
+    requests = list(requests)
+    model = FormModel(form)
+    minimized: list[dict[str, Any]] = []
+    run: list[dict[str, Any]] = []
+
+    def flush() -> None:
+        if run:
+            before = model.item_ids()
+            model.apply_all(run)
+            minimized.extend(minimize_structural_run(before, model.item_ids()))
+            run.clear()
+
+    for request in requests:
+        if is_structural(request):
+            run.append(request)
+        else:
+            flush()
+            model.apply(request)
+            minimized.append(request)
+    flush()
+
+    # created items get the same ids in both models
+    expected = FormModel(form)
+    expected.apply_all(requests)
+    actual = FormModel(form)
+    actual.apply_all(minimized)
+    assert expected.form == actual.form, "Minimized requests change the form"
+
+    return minimized
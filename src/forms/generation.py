@@ -1,10 +1,13 @@
+import threading
 from dataclasses import dataclass
 from enum import Enum, StrEnum
-from functools import total_ordering
+from functools import lru_cache, total_ordering, wraps
 from typing import Any, Optional
 
 from googleapiclient.discovery import Resource
 
+from src.forms.form_model import minimize_requests
+from src.forms.rate_limit import Quota
 from src.forms.services import retry_google_api
 from src.teachers_db import Role, Teacher
 
@@ -39,6 +42,120 @@ class Question:
     type: QuestionType = QuestionType.RATING_QUESTION
 
 
+def synchronized_cache(func):
+    """
+    lru_cache which computes every value once: threads which miss the cache
+    at the same time wait for the first one instead of repeating the work
+    """
+    cached = lru_cache(func)
+    lock = threading.Lock()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+@dataclass(frozen=True)
+class TemplateLayout:
+    revision_id: str
+    max_loc: int
+    section_itemids: tuple[tuple[int, str], ...]  # ((loc, id), ...)
+    first_non_rating_loc: int
+
+
+@synchronized_cache
+def get_template_layout(forms_service: Resource, template_id: str) -> TemplateLayout:
+    """Item positions of the template, the same for all its copies"""
+    return template_layout(get_form(forms_service, template_id))
+
+
+def template_layout(form: dict[str, Any]) -> TemplateLayout:
+    max_loc = len(form["items"])
+    section_itemids = tuple(
+        (i, item["itemId"])
+        for i, item in enumerate(form["items"])
+        if "pageBreakItem" in item
+    )
+    assert len(section_itemids) == 3, "Expected 3 section for optional questions"
+
+    return TemplateLayout(
+        revision_id=form.get("revisionId", ""),
+        max_loc=max_loc,
+        section_itemids=section_itemids,
+        first_non_rating_loc=get_first_non_rating_question_loc(form, max_loc),
+    )
+
+
+@synchronized_cache
+def plan_template_adaptation(
+    layout: TemplateLayout,
+    roles: frozenset[Role],
+    with_stats_question: bool,
+    insert_loc: Optional[int] = None,
+) -> tuple[Optional[int], tuple[dict[str, Any], ...]]:
+    """
+    Location of the stats question and requests which restructure a copy of
+    the template for the roles. They don't depend on a teacher otherwise, so
+    are computed once per role set.
+    """
+    max_loc = layout.max_loc
+    section_itemids = list(layout.section_itemids)
+    insert_loc = insert_loc if insert_loc else layout.first_non_rating_loc
+
+    stats_quest_loc = None
+    if with_stats_question:
+        if len(roles) == 1:
+            stats_quest_loc = max_loc
+        else:
+            stats_quest_loc = section_itemids[0][0]
+            max_loc += 1
+            section_itemids = [(idx + 1, id) for (idx, id) in section_itemids]
+
+    requests: list[dict[str, Any]] = []
+    if len(roles) == 1:
+        (role,) = roles
+        adapt_for_unique_role(role, insert_loc, max_loc, section_itemids, requests)
+    elif len(roles) == 2 and Role.BOTH in roles:
+        adapt_for_double_role(
+            roles,
+            insert_loc,
+            max_loc,
+            section_itemids,
+            requests,
+        )
+    else:
+        adapt_for_multiple_roles(roles, max_loc, section_itemids, requests)
+
+    # only ids of the copy items matter for the requests
+    section_ids = dict(layout.section_itemids)
+    items = [{"itemId": section_ids.get(i, str(i))} for i in range(layout.max_loc)]
+    if stats_quest_loc is not None:
+        items.insert(stats_quest_loc, {"itemId": "stats"})
+    requests = minimize_requests({"items": items}, requests)
+    return stats_quest_loc, tuple(requests)
+
+
+def get_form_roles(teacher: Teacher) -> frozenset[Role]:
+    """Roles the form of the teacher is structured for"""
+    if len(teacher.roles) == 1:
+        return frozenset([teacher.overall_role])
+    return teacher.roles
+
+
+def has_stats_question(
+    teacher: Teacher, stats_granularity: Optional[Granularity]
+) -> bool:
+    return (
+        stats_granularity is not None
+        and len(get_stats_question_options(teacher, stats_granularity)) > 1
+    )
+
+
 def adapt_form_from_template(
     teacher: Teacher,
     forms_service: Resource,
@@ -47,18 +164,25 @@ def adapt_form_from_template(
     dest_folder_id: str,
     insert_loc: Optional[int] = None,
     stats_granularity: Optional[Granularity] = None,
+    description: Optional[str] = None,
 ) -> tuple[str, str]:
-    form_id = copy_form(teacher.name, drive_service, template_id, dest_folder_id)
-    form = get_form(forms_service, form_id)
+    layout = get_template_layout(forms_service, template_id)
+    form_id = copy_form(
+        teacher.name, drive_service, template_id, dest_folder_id, description
+    )
 
-    max_loc = len(form["items"])
-    section_itemids = [
-        (i, item["itemId"])
-        for i, item in enumerate(form["items"])
-        if "pageBreakItem" in item
-    ]  # [(loc, id)]
-    assert len(section_itemids) == 3, "Expected 3 section for optional questions"
+    requests = build_adaptation_requests(teacher, layout, stats_granularity, insert_loc)
+    form_upd_res = update_form_body(requests, forms_service, form_id)
+    return form_id, form_upd_res["form"]["responderUri"]
 
+
+def build_adaptation_requests(
+    teacher: Teacher,
+    layout: TemplateLayout,
+    stats_granularity: Optional[Granularity] = None,
+    insert_loc: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """All requests which adapt a copy of the template for the teacher"""
     requests = [
         {
             "updateFormInfo": {
@@ -70,49 +194,65 @@ def adapt_form_from_template(
         }
     ]
 
-    roles = teacher.roles
-
-    if stats_granularity:
-        if len(roles) == 1:
-            stats_quest_loc = max_loc
-        else:
-            stats_quest_loc = section_itemids[0][0]
-
-        is_appended = append_optional_stats_question(
+    with_stats_question = has_stats_question(teacher, stats_granularity)
+    stats_quest_loc, plan = plan_template_adaptation(
+        layout, get_form_roles(teacher), with_stats_question, insert_loc
+    )
+    if with_stats_question:
+        append_optional_stats_question(
             teacher, stats_granularity, requests, stats_quest_loc
         )
+    requests.extend(plan)
+    return requests
 
-        if is_appended and len(roles) > 1:
-            max_loc += 1
-            section_itemids = [(idx + 1, id) for (idx, id) in section_itemids]
 
+def check_adapted_form(
+    form: dict[str, Any],
+    teacher: Teacher,
+    stats_granularity: Optional[Granularity] = None,
+) -> list[str]:
+    """Problems of the form adapted for the teacher, empty if there are none"""
+    problems = []
+    items = form["items"]
+    if form["info"].get("title") != teacher.name:
+        problems.append(f"title is {form['info'].get('title')!r}")
+
+    roles = get_form_roles(teacher)
     if len(roles) == 1:
-        insert_loc = (
-            insert_loc
-            if insert_loc
-            else get_first_non_rating_question_loc(form, max_loc)
-        )
-        adapt_for_unique_role(
-            teacher.overall_role, insert_loc, max_loc, section_itemids, requests
-        )
+        expected_sections = 0
     elif len(roles) == 2 and Role.BOTH in roles:
-        insert_loc = (
-            insert_loc
-            if insert_loc
-            else get_first_non_rating_question_loc(form, max_loc)
-        )
-        adapt_for_double_role(
-            roles,
-            insert_loc,
-            max_loc,
-            section_itemids,
-            requests,
-        )
+        expected_sections = 1
     else:
-        adapt_for_multiple_roles(roles, max_loc, section_itemids, requests)
+        expected_sections = len(roles)
+    section_locs = [i for i, item in enumerate(items) if "pageBreakItem" in item]
+    if len(section_locs) != expected_sections:
+        problems.append(f"{len(section_locs)} sections instead of {expected_sections}")
+    for loc in section_locs:
+        if loc + 1 == len(items) or "pageBreakItem" in items[loc + 1]:
+            problems.append(f"section at {loc} is empty")
+
+    section_ids = {items[loc]["itemId"] for loc in section_locs}
+    for item in items:
+        question = item.get("questionItem", {}).get("question", {})
+        for option in question.get("choiceQuestion", {}).get("options", []):
+            next_id = option.get("goToSectionId")
+            if next_id and next_id not in section_ids:
+                problems.append(f"option {option['value']!r} leads to {next_id}")
+
+    if len(roles) > 1:
+        question = items[0].get("questionItem", {}).get("question", {})
+        options = question.get("choiceQuestion", {}).get("options", [])
+        if len(options) != len(roles):
+            problems.append(f"branching question has {len(options)} options")
+
+    if stats_granularity:
+        stats_question = get_stats_question(stats_granularity)
+        num_stats = sum(1 for item in items if item.get("title") == stats_question)
+        expected_stats = int(has_stats_question(teacher, stats_granularity))
+        if num_stats != expected_stats:
+            problems.append(f"{num_stats} stats questions instead of {expected_stats}")
 
-    update_form_body(requests, forms_service, form_id, ret_form=False)
-    return form_id, form["responderUri"]
+    return problems
 
 
 def adapt_for_multiple_roles(
@@ -150,7 +290,7 @@ def adapt_for_double_role(
     section_itemids: list[tuple[int, str]],
     requests: list[dict[str, Any]],
 ):
-    shared_role = roles.difference([Role.BOTH]).pop()
+    (shared_role,) = roles.difference([Role.BOTH])
 
     idx_shared_role = 0 if shared_role == Role.PRACTICE else 1
     other_role_idx = 1 - idx_shared_role
@@ -333,6 +473,22 @@ def get_stats_question_options(teacher: Teacher, granularity: Granularity) -> li
             return []
 
 
+def stats_question_item(
+    granularity: Granularity, options: list[dict[str, str]]
+) -> dict[str, Any]:
+    return {
+        "title": get_stats_question(granularity),
+        "description": "Це питання є необов'язковим, інформація використовуєтьс виключно для "
+        "спостереженням за активністю респондентів",
+        "questionItem": {
+            "question": {
+                "required": False,
+                "choiceQuestion": {"type": "RADIO", "options": options},
+            },
+        },
+    }
+
+
 def append_optional_stats_question(
     teacher: Teacher,
     granularity: Granularity,
@@ -347,17 +503,7 @@ def append_optional_stats_question(
     requests.append(
         {
             "createItem": {
-                "item": {
-                    "title": get_stats_question(granularity),
-                    "description": "Це питання є необов'язковим, інформація використовуєтьс виключно для "
-                    "спостереженням за активністю респондентів",
-                    "questionItem": {
-                        "question": {
-                            "required": False,
-                            "choiceQuestion": {"type": "RADIO", "options": options},
-                        },
-                    },
-                },
+                "item": stats_question_item(granularity, options),
                 "location": {"index": insert_loc},
             }
         }
@@ -366,6 +512,25 @@ def append_optional_stats_question(
     return True
 
 
+def update_stats_question_options(
+    teacher: Teacher,
+    granularity: Granularity,
+    requests: list[dict[str, Any]],
+    loc: int,
+) -> None:
+    options = get_stats_question_options(teacher, granularity)
+    options = sorted(options, key=lambda item: item["value"])
+    requests.append(
+        {
+            "updateItem": {
+                "item": stats_question_item(granularity, options),
+                "location": {"index": loc},
+                "updateMask": "questionItem.question.choiceQuestion.options",
+            }
+        }
+    )
+
+
 def append_optional_chapter_for_role(
     role: Role,
     lecturer_questions: list[Question],
@@ -446,7 +611,7 @@ def get_form(forms_service, form_id):
     return forms_service.forms().get(formId=form_id).execute()
 
 
-@retry_google_api()
+@retry_google_api(quota=Quota.FORMS_WRITE)
 def update_form_body(
     requests: list[dict[str, Any]],
     forms_service: Resource,
@@ -460,11 +625,17 @@ def update_form_body(
     return form_upd_res
 
 
-@retry_google_api()
+@retry_google_api(quota=Quota.DRIVE_WRITE)
 def copy_form(
-    teacher_name: str, drive_service: Resource, template_id: str, dest_folder_id: str
+    teacher_name: str,
+    drive_service: Resource,
+    template_id: str,
+    dest_folder_id: str,
+    description: Optional[str] = None,
 ) -> str:
     form_file = {"name": teacher_name, "parents": [dest_folder_id]}
+    if description:
+        form_file["description"] = description
     copy_result = (
         drive_service.files()  # type: ignore
         .copy(fileId=template_id, body=form_file, supportsAllDrives=True)
@@ -472,3 +643,33 @@ def copy_form(
     )
     form_id = copy_result["id"]
     return form_id
+
+
+@retry_google_api(quota=Quota.DRIVE_READ)
+def get_folder_files_page(
+    drive_service: Resource, folder_id: str, page_token: Optional[str] = None
+) -> dict[str, Any]:
+    return (
+        drive_service.files()  # type: ignore
+        .list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields="nextPageToken, files(id, name, description)",
+            pageSize=1000,
+            pageToken=page_token,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+        )
+        .execute()
+    )
+
+
+def list_folder_files(drive_service: Resource, folder_id: str) -> list[dict[str, str]]:
+    """Ids, names and descriptions (if set) of all files in the drive folder"""
+    files = []
+    page_token = None
+    while True:
+        page = get_folder_files_page(drive_service, folder_id, page_token)
+        files.extend(page.get("files", []))
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return files
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from typing import Any
+
+
+def journal_key(teacher_name: str, form_info: dict[str, Any]) -> str:
+    """Identifies the teacher/entity pair of a form"""
+    entity = {
+        key: value
+        for key, value in form_info.items()
+        if key not in ("form_id", "resp_url")
+    }
+    return json.dumps([teacher_name, entity], ensure_ascii=False, sort_keys=True)
+
+
+class FormsJournal:
+    """
+    Append-only json lines log of generated forms. Every form is written as
+    soon as it is finished, so an interrupted generation can be resumed.
+    The first line keeps the generation settings which must not change
+    between runs.
+    """
+
+    def __init__(self, path: str, settings: dict[str, Any]):
+        self.path = path
+        self.settings = settings
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(self.settings, ensure_ascii=False) + "\n")
+
+    def has_forms(self) -> bool:
+        """Whether any form is recorded after the settings line"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as file:
+            file.readline()
+            return any(line.strip() for line in file)
+
+    def read(self) -> dict[str, dict[str, Any]]:
+        """journal_key -> form info of all recorded forms"""
+        if not os.path.exists(self.path):
+            self.reset()
+            return {}
+
+        forms = {}
+        with open(self.path, encoding="utf-8") as file:
+            settings = json.loads(file.readline())
+            if settings != self.settings:
+                raise ValueError(
+                    f"Journal {self.path} is written with other settings: {settings}"
+                )
+            line = ""
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # cut by a crash during the write
+                key = journal_key(entry["teacher"], entry["form_info"])
+                forms[key] = entry["form_info"]
+
+        if line and not line.endswith("\n"):
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write("\n")
+        return forms
+
+    def append(self, teacher_name: str, form_info: dict[str, Any]) -> None:
+        line = json.dumps(
+            {"teacher": teacher_name, "form_info": form_info}, ensure_ascii=False
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
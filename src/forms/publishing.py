@@ -1,13 +1,15 @@
 from googleapiclient.discovery import Resource
+from googleapiclient.http import HttpRequest
 
+from src.forms.batching import execute_batch
+from src.forms.rate_limit import Quota
 from src.forms.services import retry_google_api
 
 
-@retry_google_api()
-def __change_publish_settings(
+def __publish_settings_request(
     form_id: str, forms_service: Resource, publish: bool, accept_responses: bool
-) -> None:
-    forms_service.forms().setPublishSettings(
+) -> HttpRequest:
+    return forms_service.forms().setPublishSettings(  # type: ignore
         formId=form_id,
         body={
             "publishSettings": {
@@ -17,31 +19,68 @@ def __change_publish_settings(
                 }
             }
         },
+    )
+
+
+@retry_google_api(quota=Quota.FORMS_WRITE)
+def __change_publish_settings(
+    form_id: str, forms_service: Resource, publish: bool, accept_responses: bool
+) -> None:
+    __publish_settings_request(
+        form_id, forms_service, publish, accept_responses
     ).execute()
 
 
+def __batch_change_publish_settings(
+    form_ids: list[str], forms_service: Resource, publish: bool, accept_responses: bool
+) -> None:
+    execute_batch(
+        forms_service,
+        {
+            form_id: __publish_settings_request(
+                form_id, forms_service, publish, accept_responses
+            )
+            for form_id in form_ids
+        },
+        quota=Quota.FORMS_WRITE,
+    )
+
+
 def publish_form(form_id: str, forms_service: Resource) -> None:
     __change_publish_settings(
         form_id, forms_service, publish=True, accept_responses=True
     )
 
 
+def batch_publish_forms(form_ids: list[str], forms_service: Resource) -> None:
+    __batch_change_publish_settings(
+        form_ids, forms_service, publish=True, accept_responses=True
+    )
+
+
 def stop_accepting_responses(form_id: str, forms_service: Resource) -> None:
     __change_publish_settings(
         form_id, forms_service, publish=True, accept_responses=False
     )
 
 
+def batch_stop_accepting_responses(
+    form_ids: list[str], forms_service: Resource
+) -> None:
+    __batch_change_publish_settings(
+        form_ids, forms_service, publish=True, accept_responses=False
+    )
+
+
 def unpublish_form(form_id: str, forms_service: Resource) -> None:
     __change_publish_settings(
         form_id, forms_service, publish=False, accept_responses=False
     )
 
 
-@retry_google_api()
-def give_access_to_organization(
-    form_id: str, drive_service: Resource, domain: str = "lll.kpi.ua"
-) -> None:
+def __domain_permission_request(
+    form_id: str, drive_service: Resource, domain: str
+) -> HttpRequest:
     new_permission = {
         "type": "domain",
         "role": "reader",
@@ -49,8 +88,28 @@ def give_access_to_organization(
         "domain": domain,
     }
 
-    drive_service.permissions().create(
+    return drive_service.permissions().create(  # type: ignore
         fileId=form_id,
         body=new_permission,
         supportsAllDrives=True,
-    ).execute()
+    )
+
+
+@retry_google_api(quota=Quota.DRIVE_WRITE)
+def give_access_to_organization(
+    form_id: str, drive_service: Resource, domain: str = "lll.kpi.ua"
+) -> None:
+    __domain_permission_request(form_id, drive_service, domain).execute()
+
+
+def give_access_to_organizations(
+    form_id: str, drive_service: Resource, domains: list[str]
+) -> None:
+    execute_batch(
+        drive_service,
+        {
+            domain: __domain_permission_request(form_id, drive_service, domain)
+            for domain in domains
+        },
+        quota=Quota.DRIVE_WRITE,
+    )
@@ -0,0 +1,149 @@
+import math
+import threading
+import time
+from enum import StrEnum
+from functools import lru_cache
+from typing import Optional
+
+from googleapiclient.errors import HttpError
+
+
+class Quota(StrEnum):
+    FORMS_READ = "forms.read"
+    FORMS_WRITE = "forms.write"
+    DRIVE_READ = "drive.read"
+    DRIVE_WRITE = "drive.write"
+
+
+# Per user limits: Forms API quotas and Drive sustained write rate (~3 per second)
+DEFAULT_QUOTAS_PER_MINUTE = {
+    Quota.FORMS_READ: 390,
+    Quota.FORMS_WRITE: 150,
+    Quota.DRIVE_READ: 12000,
+    Quota.DRIVE_WRITE: 180,
+}
+# Part of the quota we use, the rest covers burst and clock differences
+QUOTA_UTILIZATION = 0.9
+
+
+class TokenBucket:
+    """
+    Token bucket which hands out reservations: a caller takes tokens even if
+    they are not yet available and gets the time it has to wait for them.
+    Negative number of tokens is the number of queued calls.
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 5.0):
+        # an infinite rate only keeps the statistics and Retry-After blocks
+        self.unlimited = math.isinf(rate_per_minute)
+        self.rate = rate_per_minute * QUOTA_UTILIZATION / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        self.num_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def __refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, tokens: int = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._blocked_until - now, 0.0)
+            if not self.unlimited:
+                self.__refill(now)
+                self._tokens -= tokens
+                wait = max(-self._tokens / self.rate, wait)
+
+            self.num_calls += tokens
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def block_for(self, seconds: float) -> None:
+        """Stop handing out tokens, e.g. the server asked to retry after"""
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+    def queue_depth(self) -> int:
+        if self.unlimited:
+            return 0
+        with self._lock:
+            self.__refill(time.monotonic())
+            return max(0, math.ceil(-self._tokens))
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "queue_depth": self.queue_depth(),
+            "calls": self.num_calls,
+            "total_wait_s": self.total_wait,
+            "max_wait_s": self.max_wait,
+        }
+
+
+class RateScheduler:
+    """Process-wide pacing of Google API calls by quota"""
+
+    def __init__(self, quotas_per_minute: dict[Quota, float]):
+        self._buckets = {
+            quota: TokenBucket(rate) for quota, rate in quotas_per_minute.items()
+        }
+
+    def reserve(self, quota: Quota, tokens: int = 1) -> float:
+        """Take tokens and return how many seconds the caller has to wait"""
+        return self._buckets[quota].reserve(tokens)
+
+    def acquire(self, quota: Quota, tokens: int = 1) -> None:
+        wait = self.reserve(quota, tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def block_for(self, quota: Quota, seconds: float) -> None:
+        self._buckets[quota].block_for(seconds)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {str(quota): bucket.stats() for quota, bucket in self._buckets.items()}
+
+
+_installed_scheduler: Optional[RateScheduler] = None
+
+
+@lru_cache(maxsize=1)
+def _get_default_rate_scheduler() -> RateScheduler:
+    return RateScheduler(DEFAULT_QUOTAS_PER_MINUTE)
+
+
+def get_rate_scheduler() -> RateScheduler:
+    if _installed_scheduler is not None:
+        return _installed_scheduler
+    return _get_default_rate_scheduler()
+
+
+def install_rate_scheduler(scheduler: RateScheduler) -> None:
+    """Replace the process-wide scheduler, e.g. to pace calls to a fake API"""
+    global _installed_scheduler
+    _installed_scheduler = scheduler
+
+
+def scaled_quotas(scale: float) -> dict[Quota, float]:
+    """Default quotas multiplied by `scale`, zero means no limits"""
+    return {
+        quota: rate * scale if scale > 0 else math.inf
+        for quota, rate in DEFAULT_QUOTAS_PER_MINUTE.items()
+    }
+
+
+def get_retry_after(error: HttpError) -> Optional[float]:
+    """Value of the Retry-After header in seconds if the server sent it"""
+    value = error.resp.get("retry-after") if error.resp else None
+    if value and value.isdigit():
+        return float(value)
+    return None
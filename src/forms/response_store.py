@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any, Optional
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+class ResponseStore:
+    """
+    Local SQLite copy of form responses keyed by form_id and responseId.
+    For every form the latest seen lastSubmittedTime is kept, so only newer
+    (or edited) responses have to be requested from the Forms API.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    form_id TEXT NOT NULL,
+                    response_id TEXT NOT NULL,
+                    last_submitted_time TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    PRIMARY KEY (form_id, response_id)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS forms (
+                    form_id TEXT PRIMARY KEY,
+                    last_submitted_time TEXT NOT NULL
+                )
+                """
+            )
+
+    def last_submitted_time(self, form_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_submitted_time FROM forms WHERE form_id = ?", (form_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, form_id: str, responses: list[dict[str, Any]]) -> None:
+        if not responses:
+            return
+
+        rows = [
+            (
+                form_id,
+                resp["responseId"],
+                resp["lastSubmittedTime"],
+                json.dumps(resp, ensure_ascii=False),
+            )
+            for resp in responses
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO responses VALUES (?, ?, ?, ?)
+                ON CONFLICT (form_id, response_id) DO UPDATE SET
+                    last_submitted_time = excluded.last_submitted_time,
+                    response = excluded.response
+                """,
+                rows,
+            )
+
+            row = self._conn.execute(
+                "SELECT last_submitted_time FROM forms WHERE form_id = ?", (form_id,)
+            ).fetchone()
+            times = [resp["lastSubmittedTime"] for resp in responses]
+            if row:
+                times.append(row[0])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO forms VALUES (?, ?)",
+                (form_id, max(times, key=_parse_timestamp)),
+            )
+
+    def iter_responses(
+        self, form_id: str, page_size: int = 1000
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Yield stored responses of the form in chunks of at most page_size"""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    """
+                    SELECT rowid, response FROM responses
+                    WHERE form_id = ? AND rowid > ?
+                    ORDER BY rowid LIMIT ?
+                    """,
+                    (form_id, last_rowid, page_size),
+                ).fetchall()
+            if not rows:
+                break
+
+            last_rowid = rows[-1][0]
+            yield [json.loads(row[1]) for row in rows]
+
+    def close(self) -> None:
+        self._conn.close()
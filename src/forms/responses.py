@@ -1,27 +1,183 @@
 from collections import defaultdict
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
 from typing import Any, Optional
 
 import pandas as pd
 from googleapiclient.discovery import Resource
+from googleapiclient.http import HttpRequest
 
+from src.forms.batching import execute_batch
 from src.forms.generation import (
     Granularity,
-    get_form,
     get_stats_question,
     get_stats_question_options,
 )
+from src.forms.response_store import ResponseStore
 from src.forms.services import retry_google_api
+from src.forms.structure_cache import FormStructureCache, get_structure_cache
 from src.teachers_db import Teacher
 
+RESPONSES_PAGE_SIZE = 1000
+
+
+def responses_list_request(
+    form_id: str,
+    forms_service: Resource,
+    page_size: int = RESPONSES_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    timestamp_filter: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> HttpRequest:
+    list_kwargs = {"formId": form_id, "pageSize": page_size}
+    if page_token:
+        list_kwargs["pageToken"] = page_token
+    if timestamp_filter:
+        list_kwargs["filter"] = timestamp_filter
+    if fields:
+        list_kwargs["fields"] = fields
+    return forms_service.forms().responses().list(**list_kwargs)  # type: ignore
+
 
 @retry_google_api()
-def get_responses(form_id: str, forms_service: Resource) -> list[dict[str, Any]]:
-    responses = forms_service.forms().responses().list(formId=form_id).execute()  # type: ignore
-    if "responses" in responses:
-        return responses["responses"]
-    else:
-        return []
+def get_responses_page(
+    form_id: str,
+    forms_service: Resource,
+    page_size: int = RESPONSES_PAGE_SIZE,
+    page_token: Optional[str] = None,
+    timestamp_filter: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> dict[str, Any]:
+    return responses_list_request(
+        form_id, forms_service, page_size, page_token, timestamp_filter, fields
+    ).execute()
+
+
+def get_responses(
+    form_id: str,
+    forms_service: Resource,
+    timestamp_filter: Optional[str] = None,
+    page_size: int = RESPONSES_PAGE_SIZE,
+    fields: Optional[str] = None,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield responses of the form page by page following nextPageToken"""
+    page_token = None
+    while True:
+        page = get_responses_page(
+            form_id, forms_service, page_size, page_token, timestamp_filter, fields
+        )
+        if "responses" in page:
+            yield page["responses"]
+
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            break
+
+
+def count_fields(stats_question_id: Optional[str] = None) -> str:
+    """
+    Partial response mask with only what is needed to count responses:
+    their ids and the answer to the stats question if any
+    """
+    if stats_question_id:
+        return (
+            "nextPageToken,"
+            f"responses(responseId,answers/{stats_question_id}/textAnswers)"
+        )
+    return "nextPageToken,responses/responseId"
+
+
+def get_stats_question_id(
+    id2q: dict[str, str], stats_granularity: Optional[Granularity]
+) -> Optional[str]:
+    if not stats_granularity:
+        return None
+    stats_question = get_stats_question(stats_granularity)
+    return next((qId for qId, q in id2q.items() if q == stats_question), None)
+
+
+def get_timestamp_filter(
+    form_id: str, response_store: Optional[ResponseStore]
+) -> Optional[str]:
+    if not response_store:
+        return None
+    last_time = response_store.last_submitted_time(form_id)
+    # >= since several responses can be submitted at the same time
+    return f"timestamp >= {last_time}" if last_time else None
+
+
+def sync_responses(
+    form_id: str,
+    forms_service: Resource,
+    response_store: ResponseStore,
+    page_size: int = RESPONSES_PAGE_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    timestamp_filter = get_timestamp_filter(form_id, response_store)
+    for page in get_responses(form_id, forms_service, timestamp_filter, page_size):
+        response_store.upsert(form_id, page)
+    yield from response_store.iter_responses(form_id, page_size)
+
+
+def fetch_responses(
+    form_id: str,
+    forms_service: Resource,
+    response_store: Optional[ResponseStore] = None,
+    page_size: int = RESPONSES_PAGE_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    if response_store:
+        return sync_responses(form_id, forms_service, response_store, page_size)
+    return get_responses(form_id, forms_service, page_size=page_size)
+
+
+def batch_fetch_responses(
+    form_ids: Iterable[str],
+    forms_service: Resource,
+    response_store: Optional[ResponseStore] = None,
+    page_size: int = RESPONSES_PAGE_SIZE,
+    fields: Optional[dict[str, str]] = None,
+) -> Iterator[tuple[str, Iterable[list[dict[str, Any]]]]]:
+    """
+    Fetch responses of several forms with batch requests: every round
+    requests the next page of all forms which still have one. Yields
+    form_id and pages of every form as soon as its last page is received,
+    so only the pages of unfinished forms are kept in memory. Partial
+    responses (`fields` by form_id) can't be combined with the store.
+    """
+    pages: dict[str, list[list[dict[str, Any]]]] = {}
+    filters: dict[str, Optional[str]] = {}
+    next_tokens: dict[str, Optional[str]] = {}
+    for form_id in form_ids:
+        pages[form_id] = []
+        filters[form_id] = get_timestamp_filter(form_id, response_store)
+        next_tokens[form_id] = None
+
+    while next_tokens:
+        requests = {
+            form_id: responses_list_request(
+                form_id,
+                forms_service,
+                page_size,
+                page_token,
+                filters[form_id],
+                fields.get(form_id) if fields else None,
+            )
+            for form_id, page_token in next_tokens.items()
+        }
+        next_tokens = {}
+        for form_id, page in execute_batch(forms_service, requests).items():
+            if "responses" in page:
+                if response_store:
+                    response_store.upsert(form_id, page["responses"])
+                else:
+                    pages[form_id].append(page["responses"])
+            if page.get("nextPageToken"):
+                next_tokens[form_id] = page["nextPageToken"]
+                continue
+
+            form_pages = pages.pop(form_id)
+            if response_store:
+                yield form_id, response_store.iter_responses(form_id, page_size)
+            else:
+                yield form_id, form_pages
 
 
 def get_num_responses(
@@ -29,76 +185,180 @@ def get_num_responses(
     forms_service: Resource,
     stats_granularity: Optional[Granularity] = None,
     teacher: Optional[Teacher] = None,
+    response_store: Optional[ResponseStore] = None,
 ) -> tuple[int, dict[str, int]]:
-    responses = get_responses(form_id, forms_service)
+    id2q = build_id_to_question_map(form_id, forms_service) if stats_granularity else {}
+    if response_store:
+        pages = sync_responses(form_id, forms_service, response_store)
+    else:
+        fields = count_fields(get_stats_question_id(id2q, stats_granularity))
+        pages = get_responses(form_id, forms_service, fields=fields)
+    return count_responses(pages, id2q, stats_granularity, teacher)
 
-    total_num_resp = len(responses)
-    num_gran_resp = defaultdict(lambda: 0)
 
+def batch_get_num_responses(
+    form_teachers: dict[str, Optional[Teacher]],
+    forms_service: Resource,
+    stats_granularity: Optional[Granularity] = None,
+    response_store: Optional[ResponseStore] = None,
+) -> dict[str, tuple[int, dict[str, int]]]:
+    """get_num_responses for every form_id -> teacher using batch requests"""
+    structure_cache = get_structure_cache()
     if stats_granularity:
-        stats_question = get_stats_question(stats_granularity)
-        id2q = build_id_to_question_map(form_id, forms_service)
-        options = get_stats_question_options(teacher, stats_granularity)
-        for opt in options:
-            num_gran_resp[opt["value"]] = 0
+        structure_cache.prefetch(form_teachers, forms_service)
+
+    id2qs = {
+        form_id: (
+            build_id_to_question_map(form_id, forms_service, structure_cache)
+            if stats_granularity
+            else {}
+        )
+        for form_id in form_teachers
+    }
+    fields = None
+    if not response_store:
+        fields = {
+            form_id: count_fields(get_stats_question_id(id2q, stats_granularity))
+            for form_id, id2q in id2qs.items()
+        }
+    counts = {
+        form_id: count_responses(
+            pages, id2qs[form_id], stats_granularity, form_teachers[form_id]
+        )
+        for form_id, pages in batch_fetch_responses(
+            form_teachers, forms_service, response_store, fields=fields
+        )
+    }
+    return {form_id: counts[form_id] for form_id in form_teachers}
+
+
+class ResponseCounter:
+    """count_responses for pages which are received one by one"""
+
+    def __init__(
+        self,
+        id2q: dict[str, str],
+        stats_granularity: Optional[Granularity] = None,
+        teacher: Optional[Teacher] = None,
+    ):
+        self.id2q = id2q
+        self.stats_granularity = stats_granularity
+        self.total_num_resp = 0
+        self.num_gran_resp = defaultdict(lambda: 0)
+
+        if stats_granularity:
+            self.stats_question = get_stats_question(stats_granularity)
+            self.options = get_stats_question_options(teacher, stats_granularity)
+            for opt in self.options:
+                self.num_gran_resp[opt["value"]] = 0
+
+    def add(self, responses: list[dict[str, Any]]) -> None:
+        self.total_num_resp += len(responses)
+        if not self.stats_granularity:
+            return
 
         for response in responses:
-            if stats_granularity < Granularity.FACULTY and len(options) == 1:
-                key = options[0]["value"]
+            if self.stats_granularity < Granularity.FACULTY and len(self.options) == 1:
+                key = self.options[0]["value"]
             else:
                 key = "Anonymous"
 
-            for qId, answer_item in response["answers"].items():
-                question = id2q[qId]
-                if question == stats_question:
+            # partial responses have no answers if the stats one is skipped
+            for qId, answer_item in response.get("answers", {}).items():
+                question = self.id2q[qId]
+                if question == self.stats_question:
                     key = answer_item["textAnswers"]["answers"][0]["value"]
 
-            num_gran_resp[key] += 1
-
-    return total_num_resp, num_gran_resp
+            self.num_gran_resp[key] += 1
 
+    def result(self) -> tuple[int, dict[str, int]]:
+        return self.total_num_resp, self.num_gran_resp
 
-def build_id_to_question_map(form_id: str, forms_service: Resource) -> dict[str, str]:
-    cur_form = get_form(forms_service, form_id)
 
-    def is_question(item) -> bool:
-        return "questionItem" in item
+def count_responses(
+    pages: Iterable[list[dict[str, Any]]],
+    id2q: dict[str, str],
+    stats_granularity: Optional[Granularity] = None,
+    teacher: Optional[Teacher] = None,
+) -> tuple[int, dict[str, int]]:
+    counter = ResponseCounter(id2q, stats_granularity, teacher)
+    for responses in pages:
+        counter.add(responses)
+    return counter.result()
 
-    questions = filter(is_question, cur_form["items"])
 
-    mapping = {
-        item["questionItem"]["question"]["questionId"]: item["title"]
-        for item in questions
-    }
-    return mapping
+def build_id_to_question_map(
+    form_id: str,
+    forms_service: Resource,
+    structure_cache: Optional[FormStructureCache] = None,
+) -> dict[str, str]:
+    if structure_cache is None:
+        structure_cache = get_structure_cache()
+    return structure_cache.get_question_map(form_id, forms_service)
 
 
 def gather_responses_to_pandas(
     form_id: str,
     forms_service: Resource,
     question_parsers: dict[str, Callable[[str], Any]],
+    response_store: Optional[ResponseStore] = None,
+) -> pd.DataFrame:
+    id2q = build_id_to_question_map(form_id, forms_service)
+    return responses_to_pandas(
+        fetch_responses(form_id, forms_service, response_store),
+        id2q,
+        question_parsers,
+    )
+
+
+def batch_gather_responses_to_pandas(
+    form_ids: list[str],
+    forms_service: Resource,
+    question_parsers: dict[str, Callable[[str], Any]],
+    response_store: Optional[ResponseStore] = None,
+) -> dict[str, pd.DataFrame]:
+    """gather_responses_to_pandas for several forms using batch requests"""
+    structure_cache = get_structure_cache()
+    structure_cache.prefetch(form_ids, forms_service)
+
+    dfs = {
+        form_id: responses_to_pandas(
+            pages,
+            build_id_to_question_map(form_id, forms_service, structure_cache),
+            question_parsers,
+        )
+        for form_id, pages in batch_fetch_responses(
+            form_ids, forms_service, response_store
+        )
+    }
+    return {form_id: dfs[form_id] for form_id in form_ids}
+
+
+def responses_to_pandas(
+    pages: Iterable[list[dict[str, Any]]],
+    id2q: dict[str, str],
+    question_parsers: dict[str, Callable[[str], Any]],
 ) -> pd.DataFrame:
     data = {q: [] for q in question_parsers}
 
     all_columns = set(question_parsers)
-    id2q = build_id_to_question_map(form_id, forms_service)
 
-    responses = get_responses(form_id, forms_service)
-    for response in responses:
-        filled_columns = set()
-        for qId, answer_item in response["answers"].items():
-            answer = answer_item["textAnswers"]["answers"][0]["value"]
+    for responses in pages:
+        for response in responses:
+            filled_columns = set()
+            for qId, answer_item in response["answers"].items():
+                answer = answer_item["textAnswers"]["answers"][0]["value"]
 
-            question = id2q.get(qId)
-            if not question:
-                continue
+                question = id2q.get(qId)
+                if not question:
+                    continue
 
-            parser = question_parsers.get(question)
-            if parser:
-                filled_columns.add(question)
-                data[question].append(parser(answer))
-        for column in all_columns.difference(filled_columns):
-            data[column].append(pd.NA)
+                parser = question_parsers.get(question)
+                if parser:
+                    filled_columns.add(question)
+                    data[question].append(parser(answer))
+            for column in all_columns.difference(filled_columns):
+                data[column].append(pd.NA)
 
     df = pd.DataFrame.from_dict(data)
 
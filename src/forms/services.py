@@ -1,29 +1,152 @@
+import asyncio
 import os
+import queue
 from functools import lru_cache, wraps
 import random
+import threading
 import time
 
+import httplib2
+
 from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import Resource, build
+from googleapiclient.discovery import DISCOVERY_URI, Resource, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 
+from src.forms.rate_limit import Quota, get_rate_scheduler, get_retry_after
+from src.forms.telemetry import (
+    InstrumentedHttpRequest,
+    get_error_method,
+    get_telemetry,
+)
 
-@lru_cache(maxsize=1)
-def get_drive_service(credentials: Credentials) -> Resource:
-    return build("drive", "v3", credentials=credentials)
+
+DISCOVERY_CACHE_DIR = os.environ.get(
+    "GOOGLE_DISCOVERY_CACHE", os.path.join(".cache", "discovery")
+)
+DISCOVERY_URLS = {
+    "forms": "https://forms.googleapis.com/$discovery/rest?version={apiVersion}",
+}
+HTTP_POOL_SIZE = 8
+
+
+def get_discovery_document(service_name: str, version: str) -> str:
+    """
+    Discovery document bundled with googleapiclient or, if there is none,
+    cached on disk after the first download
+    """
+    document = get_static_doc(service_name, version)
+    if document:
+        return document
+
+    path = os.path.join(DISCOVERY_CACHE_DIR, f"{service_name}.{version}.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+
+    url = DISCOVERY_URLS.get(service_name, DISCOVERY_URI).format(
+        api=service_name, apiVersion=version
+    )
+    resp, content = build_http().request(url)
+    if resp.status >= 400:
+        raise HttpError(resp, content, uri=url)
+    document = content.decode("utf-8")
+
+    os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(document)
+    os.replace(tmp_path, path)
+    return document
+
+
+class PooledHttp:
+    """
+    Thread-safe httplib2.Http replacement: every request borrows one of at
+    most `pool_size` Http objects, which keep their connections alive
+    between requests.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE):
+        self.pool_size = pool_size
+        self._idle: queue.LifoQueue[httplib2.Http] = queue.LifoQueue()
+        self._slots = threading.Semaphore(pool_size)
+        self._lock = threading.Lock()
+
+    def ensure_size(self, pool_size: int) -> None:
+        """Allow at least `pool_size` concurrent requests, the pool never shrinks"""
+        with self._lock:
+            if pool_size > self.pool_size:
+                self._slots.release(pool_size - self.pool_size)
+                self.pool_size = pool_size
+
+    def request(self, *args, **kwargs):
+        with self._slots:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                http = build_http()
+            try:
+                return http.request(*args, **kwargs)
+            finally:
+                self._idle.put(http)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
 
 
 @lru_cache(maxsize=1)
-def get_forms_service(credentials: Credentials) -> Resource:
-    DISCOVERY_DOC = "https://forms.googleapis.com/$discovery/rest?version=v1"
-    return build(
-        "forms", "v1", credentials=credentials, discoveryServiceUrl=DISCOVERY_DOC
+def get_authorized_http(credentials: Credentials) -> AuthorizedHttp:
+    """
+    Transport shared by all services built with the same credentials. Its
+    pool is grown to the largest size requested by build_service.
+    """
+    return AuthorizedHttp(credentials, http=PooledHttp())
+
+
+@lru_cache(maxsize=2)
+def _build_shared_service(
+    service_name: str, version: str, credentials: Credentials
+) -> Resource:
+    return build_from_document(
+        get_discovery_document(service_name, version),
+        http=get_authorized_http(credentials),
+        requestBuilder=InstrumentedHttpRequest,
     )
 
 
+def build_service(
+    service_name: str,
+    version: str,
+    credentials: Credentials,
+    pool_size: int = HTTP_POOL_SIZE,
+) -> Resource:
+    get_authorized_http(credentials).http.ensure_size(pool_size)
+    return _build_shared_service(service_name, version, credentials)
+
+
+def get_drive_service(
+    credentials: Credentials, pool_size: int = HTTP_POOL_SIZE
+) -> Resource:
+    return build_service("drive", "v3", credentials, pool_size)
+
+
+def get_forms_service(
+    credentials: Credentials, pool_size: int = HTTP_POOL_SIZE
+) -> Resource:
+    """
+    Forms service which can be used from several threads at once since the
+    transport is pooled
+    """
+    return build_service("forms", "v1", credentials, pool_size)
+
+
 def get_gapi_credentials(cred_file: str, token_store_file: str) -> Credentials:
     SCOPES = [
         "https://www.googleapis.com/auth/forms.body",
@@ -53,17 +176,42 @@ def get_gapi_credentials(cred_file: str, token_store_file: str) -> Credentials:
     return creds
 
 
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    delay = min(
+        max_delay,
+        base_delay * (2**attempt),
+    )
+    return delay * random.uniform(0.5, 1.5)
+
+
+def retry_delay(
+    error: HttpError,
+    quota: Quota,
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+) -> float:
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        # pause every call of this quota, so the next reservation waits for it
+        get_rate_scheduler().block_for(quota, retry_after)
+        return 0.0
+    return backoff_delay(attempt, base_delay, max_delay)
+
+
 def retry_google_api(
     *,
     retries: int = 5,
     base_delay: float = 1.0,
     max_delay: float = 30.0,
     retry_statuses: tuple[int, ...] = (429, 500, 503),
+    quota: Quota = Quota.FORMS_READ,
 ):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             for attempt in range(retries):
+                get_rate_scheduler().acquire(quota)
                 try:
                     return func(*args, **kwargs)
                 except HttpError as e:
@@ -75,13 +223,52 @@ def retry_google_api(
                     if attempt == retries - 1:
                         raise
 
-                    delay = min(
-                        max_delay,
-                        base_delay * (2**attempt),
+                    get_telemetry().record_retry(
+                        get_error_method(e, func.__name__), status
                     )
-                    delay *= random.uniform(0.5, 1.5)
 
-                    time.sleep(delay)
+                    time.sleep(retry_delay(e, quota, attempt, base_delay, max_delay))
+
+        return wrapper
+
+    return decorator
+
+
+def async_retry_google_api(
+    *,
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    retry_statuses: tuple[int, ...] = (429, 500, 503),
+    quota: Quota = Quota.FORMS_READ,
+):
+    """retry_google_api for coroutines: waits without blocking the event loop"""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(retries):
+                wait = get_rate_scheduler().reserve(quota)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    return await func(*args, **kwargs)
+                except HttpError as e:
+                    status = getattr(e.resp, "status", None)
+
+                    if status not in retry_statuses:
+                        raise
+
+                    if attempt == retries - 1:
+                        raise
+
+                    get_telemetry().record_retry(
+                        get_error_method(e, func.__name__), status
+                    )
+
+                    await asyncio.sleep(
+                        retry_delay(e, quota, attempt, base_delay, max_delay)
+                    )
 
         return wrapper
 
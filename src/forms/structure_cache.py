@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Any, Optional
+
+from googleapiclient.discovery import Resource
+
+from src.forms.batching import execute_batch
+from src.forms.generation import get_form
+from src.forms.services import retry_google_api
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "FORM_STRUCTURE_CACHE", os.path.join(".cache", "forms", "structures.jsonl")
+)
+
+
+@retry_google_api()
+def get_form_revision(forms_service: Resource, form_id: str) -> str:
+    form = forms_service.forms().get(formId=form_id, fields="revisionId").execute()  # type: ignore
+    return form["revisionId"]
+
+
+def form_to_question_map(form: dict[str, Any]) -> dict[str, str]:
+    def is_question(item) -> bool:
+        return "questionItem" in item
+
+    questions = filter(is_question, form["items"])
+
+    mapping = {
+        item["questionItem"]["question"]["questionId"]: item["title"]
+        for item in questions
+    }
+    return mapping
+
+
+class FormStructureCache:
+    """
+    Persistent cache of questionId -> title maps keyed by form_id and the
+    form revisionId. Forms don't change after generation, so by default
+    cached entries are trusted as is. With `revalidate` only the revisionId
+    is requested and the structure is refetched if it differs. New entries
+    are appended to a json lines file, the latest line of a form wins.
+    """
+
+    def __init__(self, path: Optional[str], revalidate: bool = False):
+        self.path = path
+        self.revalidate = revalidate
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = {}
+        # forms whose revision is already checked by this process
+        self._validated: set[str] = set()
+        if path and os.path.exists(path):
+            self.__load()
+
+    def get_question_map(self, form_id: str, forms_service: Resource) -> dict[str, str]:
+        with self._lock:
+            entry = self._entries.get(form_id)
+
+        if entry and self.revalidate and form_id not in self._validated:
+            revision_id = get_form_revision(forms_service, form_id)
+            if revision_id != entry["revision_id"]:
+                entry = None
+
+        if not entry:
+            form = get_form(forms_service, form_id)
+            entry = {
+                "revision_id": form.get("revisionId"),
+                "questions": form_to_question_map(form),
+            }
+            with self._lock:
+                self._entries[form_id] = entry
+                self.__append({form_id: entry})
+        self._validated.add(form_id)
+
+        return entry["questions"]
+
+    def prefetch(self, form_ids: Iterable[str], forms_service: Resource) -> None:
+        """Fetch structures of all not yet cached forms with batch requests"""
+        form_ids = list(form_ids)
+        with self._lock:
+            cached = {
+                form_id: self._entries[form_id]["revision_id"]
+                for form_id in form_ids
+                if form_id in self._entries
+            }
+            missing = [form_id for form_id in form_ids if form_id not in cached]
+
+        to_check = [form_id for form_id in cached if form_id not in self._validated]
+        if to_check and self.revalidate:
+            revisions = execute_batch(
+                forms_service,
+                {
+                    form_id: forms_service.forms().get(  # type: ignore
+                        formId=form_id, fields="revisionId"
+                    )
+                    for form_id in to_check
+                },
+            )
+            missing.extend(
+                form_id
+                for form_id in to_check
+                if revisions[form_id]["revisionId"] != cached[form_id]
+            )
+
+        if missing:
+            forms = execute_batch(
+                forms_service,
+                {
+                    form_id: forms_service.forms().get(formId=form_id)  # type: ignore
+                    for form_id in missing
+                },
+            )
+            entries = {
+                form_id: {
+                    "revision_id": form.get("revisionId"),
+                    "questions": form_to_question_map(form),
+                }
+                for form_id, form in forms.items()
+            }
+            with self._lock:
+                self._entries.update(entries)
+                self.__append(entries)
+        self._validated.update(form_ids)
+
+    def __load(self) -> None:
+        num_lines = 0
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                num_lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # cut by a crash during the write
+                self._entries[entry["form_id"]] = {
+                    "revision_id": entry["revision_id"],
+                    "questions": entry["questions"],
+                }
+        if num_lines > len(self._entries):
+            self.__compact()
+
+    def __compact(self) -> None:
+        """Rewrite the file with only the latest entry of every form"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for form_id, entry in self._entries.items():
+                file.write(self.__line(form_id, entry))
+        os.replace(tmp_path, self.path)
+
+    def __append(self, entries: dict[str, dict[str, Any]]) -> None:
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(
+                "".join(
+                    self.__line(form_id, entry) for form_id, entry in entries.items()
+                )
+            )
+
+    @staticmethod
+    def __line(form_id: str, entry: dict[str, Any]) -> str:
+        return json.dumps({"form_id": form_id, **entry}, ensure_ascii=False) + "\n"
+
+
+@lru_cache(maxsize=1)
+def get_structure_cache() -> FormStructureCache:
+    return FormStructureCache(
+        DEFAULT_CACHE_PATH or None,
+        revalidate=os.environ.get("FORM_STRUCTURE_REVALIDATE", "") == "1",
+    )
@@ -0,0 +1,190 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from src.forms.rate_limit import get_rate_scheduler
+
+# Upper bounds of latency histogram buckets in seconds (the last is +inf)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_TELEMETRY_DIR = os.path.join(".cache", "telemetry")
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    batched_calls: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    latency_histogram: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+    errors: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    retries: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+
+class ApiTelemetry:
+    """Thread-safe counters of Google API calls aggregated by API method"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods: dict[str, MethodStats] = defaultdict(MethodStats)
+        self.started_at = time.time()
+
+    def record_call(
+        self,
+        method: str,
+        latency: float,
+        bytes_sent: int = 0,
+        error_status: Optional[int] = None,
+    ) -> None:
+        with self._lock:
+            stats = self._methods[method]
+            stats.calls += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats.bytes_sent += bytes_sent
+            if error_status is not None:
+                stats.errors[error_status] += 1
+
+    def record_batched(self, method: str, num_calls: int = 1) -> None:
+        with self._lock:
+            self._methods[method].batched_calls += num_calls
+
+    def record_received(self, method: str, num_bytes: int) -> None:
+        with self._lock:
+            self._methods[method].bytes_received += num_bytes
+
+    def record_retry(self, method: str, status: Optional[int]) -> None:
+        with self._lock:
+            self._methods[method].retries[status or 0] += 1
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            methods = {
+                method: {
+                    "calls": stats.calls,
+                    "batched_calls": stats.batched_calls,
+                    "total_latency_s": stats.total_latency,
+                    "mean_latency_s": (
+                        stats.total_latency / stats.calls if stats.calls else 0.0
+                    ),
+                    "max_latency_s": stats.max_latency,
+                    "latency_histogram": dict(
+                        zip(
+                            [f"<={b}s" for b in LATENCY_BUCKETS] + ["inf"],
+                            stats.latency_histogram,
+                        )
+                    ),
+                    "errors": dict(stats.errors),
+                    "retries": dict(stats.retries),
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                }
+                for method, stats in sorted(self._methods.items())
+            }
+        return {
+            "elapsed_s": time.time() - self.started_at,
+            "methods": methods,
+            "rate_limits": get_rate_scheduler().stats(),
+        }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [f"Google API telemetry ({summary['elapsed_s']:.1f} s)"]
+        methods = sorted(
+            summary["methods"].items(),
+            key=lambda item: item[1]["total_latency_s"],
+            reverse=True,
+        )
+        for method, stats in methods:
+            retries = sum(stats["retries"].values())
+            lines.append(
+                f"{method}: {stats['calls']} calls (+{stats['batched_calls']} batched), "
+                f"{stats['total_latency_s']:.1f} s total, "
+                f"{stats['mean_latency_s'] * 1000:.0f} ms mean, "
+                f"{retries} retries, "
+                f"{stats['bytes_received'] / 2**10:.0f} KiB received"
+            )
+        for quota, stats in summary["rate_limits"].items():
+            if stats["calls"]:
+                lines.append(
+                    f"{quota} limiter: {stats['calls']} calls, "
+                    f"{stats['total_wait_s']:.1f} s waited "
+                    f"(max {stats['max_wait_s']:.1f} s), "
+                    f"{stats['queue_depth']} queued"
+                )
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=4)
+
+
+@lru_cache(maxsize=1)
+def get_telemetry() -> ApiTelemetry:
+    return ApiTelemetry()
+
+
+class InstrumentedHttpRequest(HttpRequest):
+    """HttpRequest which reports every execution to the telemetry"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        postproc = self.postproc
+
+        # postproc is also called for responses of batched requests
+        def instrumented_postproc(resp, content):
+            get_telemetry().record_received(self.methodId, len(content or b""))
+            return postproc(resp, content)
+
+        self.postproc = instrumented_postproc
+
+    def execute(self, http=None, num_retries=0):
+        error_status = None
+        start = time.perf_counter()
+        try:
+            return super().execute(http=http, num_retries=num_retries)
+        except HttpError as e:
+            error_status = getattr(e.resp, "status", None)
+            e.method_id = self.methodId
+            get_telemetry().record_received(self.methodId, len(e.content or b""))
+            raise
+        finally:
+            get_telemetry().record_call(
+                self.methodId,
+                time.perf_counter() - start,
+                bytes_sent=len(self.body or ""),
+                error_status=error_status,
+            )
+
+
+def get_error_method(error: HttpError, default: str) -> str:
+    """API method of the request which failed with the error, if known"""
+    return getattr(error, "method_id", default)
+
+
+def report_at_exit(name: str, path: Optional[str] = None) -> None:
+    """Print the telemetry summary and save it to json when the script exits"""
+    if path is None:
+        path = os.path.join(DEFAULT_TELEMETRY_DIR, f"{name}.json")
+
+    def report():
+        telemetry = get_telemetry()
+        print(telemetry.format_summary())
+        telemetry.dump(path)
+
+    atexit.register(report)
@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from googleapiclient.discovery import Resource
+from googleapiclient.errors import HttpError
+
+from src.forms.generation import (
+    Granularity,
+    copy_form,
+    get_form_roles,
+    get_stats_question,
+    get_template_layout,
+    has_stats_question,
+    plan_template_adaptation,
+    stats_question_item,
+    update_form_body,
+    update_stats_question_options,
+)
+from src.teachers_db import Role, Teacher
+
+DEFAULT_VARIANTS_PATH = os.environ.get(
+    "TEMPLATE_VARIANTS", os.path.join(".cache", "forms", "template_variants.json")
+)
+
+
+@dataclass(frozen=True)
+class TemplateVariant:
+    form_id: str
+    stats_question_loc: Optional[int] = None
+
+
+def variant_key(roles: frozenset[Role], stats_granularity: Optional[Granularity]):
+    key = "+".join(sorted(str(role) for role in roles))
+    return f"{key}|{stats_granularity}" if stats_granularity else key
+
+
+class TemplateVariants:
+    """
+    Copies of the template already restructured for a role set (with a
+    placeholder stats question if needed) which are created in the
+    destination folder on first use. A form copied from a variant needs only
+    its title and stats options to be set. Variants are kept in a json file
+    by template id, destination folder and template revision, so they are
+    reused between runs into the same folder.
+    """
+
+    def __init__(
+        self,
+        template_id: str,
+        dest_folder_id: str,
+        forms_service: Resource,
+        drive_service: Resource,
+        path: Optional[str] = None,
+    ):
+        self.template_id = template_id
+        self.dest_folder_id = dest_folder_id
+        self.forms_service = forms_service
+        self.drive_service = drive_service
+        self.path = path
+        self._lock = threading.Lock()
+
+        self.revision_id = get_template_layout(forms_service, template_id).revision_id
+        self._entries: dict[str, dict] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self._entries = json.load(file)
+        entry_key = f"{template_id}/{dest_folder_id}"
+        entry = self._entries.get(entry_key)
+        if not entry or entry["revision_id"] != self.revision_id:
+            entry = {"revision_id": self.revision_id, "variants": {}}
+            self._entries[entry_key] = entry
+        self._variants: dict[str, dict] = entry["variants"]
+
+    def get(
+        self, roles: frozenset[Role], stats_granularity: Optional[Granularity]
+    ) -> TemplateVariant:
+        key = variant_key(roles, stats_granularity)
+        variant = self._variants.get(key)
+        if variant is None:
+            # variants are few, so they are created one at a time
+            with self._lock:
+                variant = self._variants.get(key)
+                if variant is None:
+                    variant = asdict(self.__create(key, roles, stats_granularity))
+                    self._variants[key] = variant
+                    self.__dump()
+        return TemplateVariant(**variant)
+
+    def discard(
+        self, roles: frozenset[Role], stats_granularity: Optional[Granularity]
+    ) -> None:
+        with self._lock:
+            self._variants.pop(variant_key(roles, stats_granularity), None)
+            self.__dump()
+
+    def __create(
+        self,
+        key: str,
+        roles: frozenset[Role],
+        stats_granularity: Optional[Granularity],
+    ) -> TemplateVariant:
+        layout = get_template_layout(self.forms_service, self.template_id)
+        stats_quest_loc, plan = plan_template_adaptation(
+            layout, roles, stats_granularity is not None
+        )
+
+        title = f"Template [{key}]"
+        form_id = copy_form(
+            title, self.drive_service, self.template_id, self.dest_folder_id
+        )
+        requests = [
+            {
+                "updateFormInfo": {
+                    "info": {"title": title},
+                    "updateMask": "title",
+                }
+            }
+        ]
+        if stats_granularity:
+            placeholder = [{"value": "-"}]
+            requests.append(
+                {
+                    "createItem": {
+                        "item": stats_question_item(stats_granularity, placeholder),
+                        "location": {"index": stats_quest_loc},
+                    }
+                }
+            )
+        requests.extend(plan)
+        form = update_form_body(requests, self.forms_service, form_id)["form"]
+
+        if not stats_granularity:
+            return TemplateVariant(form_id)
+        stats_question = get_stats_question(stats_granularity)
+        stats_quest_loc = next(
+            i
+            for i, item in enumerate(form["items"])
+            if item.get("title") == stats_question
+        )
+        return TemplateVariant(form_id, stats_quest_loc)
+
+    def __dump(self) -> None:
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._entries, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def adapt_form_from_variant(
+    teacher: Teacher,
+    forms_service: Resource,
+    drive_service: Resource,
+    variants: TemplateVariants,
+    dest_folder_id: str,
+    stats_granularity: Optional[Granularity] = None,
+    description: Optional[str] = None,
+) -> tuple[str, str]:
+    """adapt_form_from_template which copies the variant for teacher roles"""
+    roles = get_form_roles(teacher)
+    if not has_stats_question(teacher, stats_granularity):
+        stats_granularity = None
+
+    variant = variants.get(roles, stats_granularity)
+    try:
+        form_id = copy_form(
+            teacher.name, drive_service, variant.form_id, dest_folder_id, description
+        )
+    except HttpError as e:
+        if getattr(e.resp, "status", None) != 404:
+            raise
+        # the variant is deleted from the folder since it was recorded
+        variants.discard(roles, stats_granularity)
+        variant = variants.get(roles, stats_granularity)
+        form_id = copy_form(
+            teacher.name, drive_service, variant.form_id, dest_folder_id, description
+        )
+
+    requests = [
+        {
+            "updateFormInfo": {
+                "info": {
+                    "title": teacher.name,
+                },
+                "updateMask": "title",
+            }
+        }
+    ]
+    if stats_granularity:
+        update_stats_question_options(
+            teacher, stats_granularity, requests, variant.stats_question_loc
+        )
+
+    form_upd_res = update_form_body(requests, forms_service, form_id)
+    return form_id, form_upd_res["form"]["responderUri"]
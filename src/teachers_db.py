@@ -1,13 +1,24 @@
+import contextlib
+import hashlib
 import json
+import logging
 import operator
+import os
+import pickle
+import time
 from collections.abc import Callable, Iterable, Iterator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Flag, StrEnum, auto
-from functools import reduce
+from functools import cached_property, lru_cache, reduce
 from itertools import chain
-from typing import Optional
+from typing import ClassVar, Literal, Optional
 from warnings import warn
 
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
 
 class Role(Flag):
     LECTURER = auto()
@@ -57,11 +68,39 @@ _op_to_spec_code = {
 _spec_code_to_spec = {v: k for k, v in _op_to_spec_code.items()}
 
 
-@dataclass(eq=True, frozen=True, slots=True)
+# Stream, Group and Audience are interned: constructing an instance with the same
+# arguments returns the already existing object, so equality and hashing are by
+# identity and derived attributes are computed only once per distinct value.
+
+
+@dataclass(eq=False, frozen=True, slots=True, init=False)
 class Stream:
     speciality: Speciality
     year: str
 
+    _interned: ClassVar[dict[tuple[Speciality, str], "Stream"]] = {}
+
+    def __new__(cls, speciality: Speciality, year: str) -> "Stream":
+        key = (Speciality(speciality), year)
+        stream = cls._interned.get(key)
+        if stream is None:
+            stream = object.__new__(cls)
+            object.__setattr__(stream, "speciality", key[0])
+            object.__setattr__(stream, "year", year)
+            stream = cls._interned.setdefault(key, stream)
+        return stream
+
+    @classmethod
+    def lookup(cls, speciality: str, year: str) -> Optional["Stream"]:
+        """Already existing stream, new ones are not interned"""
+        try:
+            return cls._interned.get((Speciality(speciality), year))
+        except ValueError:
+            return None
+
+    def __reduce__(self):
+        return (Stream, (self.speciality, self.year))
+
     def __str__(self):
         return f"{_op_to_spec_code[self.speciality]}-{self.year}x"
 
@@ -72,38 +111,74 @@ class Stream:
         return Stream(speciality=spec, year=year[0])
 
 
-@dataclass(eq=True, frozen=True, slots=True)
-class Group:
-    name: str
-
-    @property
-    def speciality(self):
-        letter_to_op = {
-            "ФІ": Speciality.APPLIED_MATH,
-            "ФФ": Speciality.APPLIED_PHYSICS,
-            "ФБ": Speciality.CYBERSECURITY,
-            "ФЕ": Speciality.CYBERSECURITY,
-        }
-        return letter_to_op[self.name[:2]]
+_group_prefix_to_spec = {
+    "ФІ": Speciality.APPLIED_MATH,
+    "ФФ": Speciality.APPLIED_PHYSICS,
+    "ФБ": Speciality.CYBERSECURITY,
+    "ФЕ": Speciality.CYBERSECURITY,
+}
 
-    @property
-    def enrollment_year(self) -> str:
-        return self.name.split("-")[1][0]
 
-    @property
-    def stream(self) -> Stream:
-        return Stream(self.speciality, self.enrollment_year)
+@dataclass(eq=False, frozen=True, slots=True, init=False)
+class Group:
+    name: str
+    speciality: Speciality = field(repr=False)
+    enrollment_year: str = field(repr=False)
+    stream: Stream = field(repr=False)
+
+    _interned: ClassVar[dict[str, "Group"]] = {}
+
+    def __new__(cls, name: str) -> "Group":
+        group = cls._interned.get(name)
+        if group is None:
+            try:
+                speciality = _group_prefix_to_spec[name[:2]]
+                enrollment_year = name.split("-")[1][0]
+            except (KeyError, IndexError):
+                raise ValueError(f"Invalid group name: {name}") from None
+
+            group = object.__new__(cls)
+            object.__setattr__(group, "name", name)
+            object.__setattr__(group, "speciality", speciality)
+            object.__setattr__(group, "enrollment_year", enrollment_year)
+            object.__setattr__(group, "stream", Stream(speciality, enrollment_year))
+            group = cls._interned.setdefault(name, group)
+        return group
+
+    @classmethod
+    def lookup(cls, name: str) -> Optional["Group"]:
+        """Already existing group with the name, new ones are not interned"""
+        return cls._interned.get(name)
+
+    def __reduce__(self):
+        return (Group, (self.name,))
 
     def __str__(self):
         return self.name
 
 
-@dataclass(eq=True, frozen=True, slots=True)
+@dataclass(eq=False, frozen=True, slots=True, init=False)
 class Audience:
     group: Group
     role: Role
     is_elective: bool = False
 
+    _interned: ClassVar[dict[tuple[Group, Role, bool], "Audience"]] = {}
+
+    def __new__(cls, group: Group, role: Role, is_elective: bool = False) -> "Audience":
+        key = (group, role, is_elective)
+        aud = cls._interned.get(key)
+        if aud is None:
+            aud = object.__new__(cls)
+            object.__setattr__(aud, "group", group)
+            object.__setattr__(aud, "role", role)
+            object.__setattr__(aud, "is_elective", is_elective)
+            aud = cls._interned.setdefault(key, aud)
+        return aud
+
+    def __reduce__(self):
+        return (Audience, (self.group, self.role, self.is_elective))
+
     @property
     def speciality(self):
         return self.group.speciality
@@ -122,30 +197,43 @@ class Course:
     name: str
     audiences: list[Audience]
 
-    @property
-    def specialities(self) -> set[Speciality]:
-        return set(aud.speciality for aud in self.audiences)
+    _derived_props = (
+        "specialities",
+        "groups",
+        "enrollment_years",
+        "streams",
+        "roles",
+        "overall_role",
+    )
 
-    @property
-    def groups(self) -> set[Group]:
-        return set(aud.group for aud in self.audiences)
+    @cached_property
+    def specialities(self) -> frozenset[Speciality]:
+        return frozenset(aud.speciality for aud in self.audiences)
 
-    @property
-    def enrollment_years(self) -> set[str]:
-        return set(aud.enrollment_year for aud in self.audiences)
+    @cached_property
+    def groups(self) -> frozenset[Group]:
+        return frozenset(aud.group for aud in self.audiences)
 
-    @property
-    def streams(self) -> set[Stream]:
-        return set(aud.stream for aud in self.audiences)
+    @cached_property
+    def enrollment_years(self) -> frozenset[str]:
+        return frozenset(aud.enrollment_year for aud in self.audiences)
 
-    @property
-    def roles(self) -> set[Role]:
-        return set(aud.role for aud in self.audiences)
+    @cached_property
+    def streams(self) -> frozenset[Stream]:
+        return frozenset(aud.stream for aud in self.audiences)
 
-    @property
+    @cached_property
+    def roles(self) -> frozenset[Role]:
+        return frozenset(aud.role for aud in self.audiences)
+
+    @cached_property
     def overall_role(self) -> Role:
         return reduce(operator.or_, (aud.role for aud in self.audiences))
 
+    def invalidate_cache(self) -> None:
+        for prop in self._derived_props:
+            self.__dict__.pop(prop, None)
+
 
 def nan_or(opt_role: Optional[Role], role: Role) -> Role:
     if opt_role:
@@ -160,36 +248,48 @@ class Teacher:
     courses: list[Course]
     student_per_group: dict[str, int]
 
-    @property
+    _derived_props = (
+        "num_students",
+        "specialities",
+        "groups",
+        "enrollment_years",
+        "streams",
+        "overall_role",
+        "roles",
+    )
+
+    @cached_property
     def num_students(self) -> int:
         return sum(self.student_per_group.values())
 
-    @property
-    def specialities(self) -> set[Speciality]:
-        return set(chain.from_iterable(c.specialities for c in self.courses))
+    @cached_property
+    def specialities(self) -> frozenset[Speciality]:
+        return frozenset(chain.from_iterable(c.specialities for c in self.courses))
 
-    @property
-    def groups(self) -> set[Group]:
-        return set(Group(gname) for gname in self.student_per_group.keys())
+    @cached_property
+    def groups(self) -> frozenset[Group]:
+        return frozenset(Group(gname) for gname in self.student_per_group.keys())
 
-    @property
-    def enrollment_years(self) -> set[str]:
-        return set(chain.from_iterable(c.enrollment_years for c in self.courses))
+    @cached_property
+    def enrollment_years(self) -> frozenset[str]:
+        return frozenset(chain.from_iterable(c.enrollment_years for c in self.courses))
 
-    @property
-    def streams(self) -> set[Stream]:
-        return set(chain.from_iterable(c.streams for c in self.courses))
+    @cached_property
+    def streams(self) -> frozenset[Stream]:
+        return frozenset(chain.from_iterable(c.streams for c in self.courses))
 
-    @property
+    @cached_property
     def overall_role(self) -> Role:
         return reduce(operator.or_, (c.overall_role for c in self.courses))
 
+    def audiences(self) -> Iterator[Audience]:
+        return (aud for c in self.courses for aud in c.audiences)
+
     def __overall_role_for(
         self, predicate: Callable[[Audience], bool]
     ) -> Optional[Role]:
-        all_audiences = (aud for c in self.courses for aud in c.audiences)
         return reduce(
-            nan_or, (aud.role for aud in all_audiences if predicate(aud)), None
+            nan_or, (aud.role for aud in self.audiences() if predicate(aud)), None
         )
 
     def overall_role_for_group(self, group: str | Group) -> Optional[Role]:
@@ -198,10 +298,10 @@ class Teacher:
         else:
             return self.__overall_role_for(lambda aud: aud.group == group)
 
-    @property
-    def roles(self) -> set[Role]:
+    @cached_property
+    def roles(self) -> frozenset[Role]:
         all_roles = set()
-        all_audiences = list(aud for c in self.courses for aud in c.audiences)
+        all_audiences = list(self.audiences())
         for group in self.groups:
             if len(all_roles) == 3:
                 break
@@ -218,7 +318,7 @@ class Teacher:
                 for aud in elective_auds_new_roles:
                     all_roles.add(aud.role)
 
-        return all_roles
+        return frozenset(all_roles)
 
     def overall_role_for_spec(self, speciality: Speciality) -> Optional[Role]:
         return self.__overall_role_for(lambda aud: aud.speciality == speciality)
@@ -255,14 +355,105 @@ class Teacher:
             if group.stream == stream
         )
 
+    def invalidate_cache(self) -> None:
+        for prop in self._derived_props:
+            self.__dict__.pop(prop, None)
+
     def __post_init__(self):
         assert len(self.name.split()) == 3
         assert self.num_students > 0
 
 
+class TeacherView(Teacher):
+    """
+    Read-only view of the teacher restricted to audiences matching
+    the predicate. Filtered courses and students per group are built
+    only on access.
+    """
+
+    _derived_props = Teacher._derived_props + ("courses", "student_per_group")
+
+    def __init__(self, teacher: Teacher, predicate: Callable[[Audience], bool]):
+        self.name = teacher.name
+        self.teacher = teacher
+        self.predicate = predicate
+
+    def audiences(self) -> Iterator[Audience]:
+        return filter(self.predicate, self.teacher.audiences())
+
+    @cached_property
+    def courses(self) -> list[Course]:
+        courses = []
+        for course in self.teacher.courses:
+            auds = list(filter(self.predicate, course.audiences))
+            if auds:
+                courses.append(Course(course.name, audiences=auds))
+        return courses
+
+    @cached_property
+    def student_per_group(self) -> dict[str, int]:
+        return {
+            group.name: self.teacher.student_per_group[group.name]
+            for group in self.groups
+        }
+
+    @cached_property
+    def num_students(self) -> int:
+        return sum(self.teacher.student_per_group[group.name] for group in self.groups)
+
+    @cached_property
+    def groups(self) -> frozenset[Group]:
+        return frozenset(aud.group for aud in self.audiences())
+
+    @cached_property
+    def specialities(self) -> frozenset[Speciality]:
+        return frozenset(group.speciality for group in self.groups)
+
+    @cached_property
+    def enrollment_years(self) -> frozenset[str]:
+        return frozenset(group.enrollment_year for group in self.groups)
+
+    @cached_property
+    def streams(self) -> frozenset[Stream]:
+        return frozenset(group.stream for group in self.groups)
+
+    @cached_property
+    def overall_role(self) -> Role:
+        return reduce(operator.or_, (aud.role for aud in self.audiences()))
+
+    def num_students_for_group(self, group: str | Group) -> int:
+        if isinstance(group, str):
+            group = Group.lookup(group)
+        if group not in self.groups:
+            return 0
+        return self.teacher.num_students_for_group(group)
+
+
+# entity -> teacher name -> number of audiences (0 if only students are known)
+_IndexEntries = dict[str, int]
+_EntityColumn = Literal["group", "stream", "speciality", "year"]
+_fact_columns = (
+    "teacher",
+    "course",
+    "group",
+    "speciality",
+    "year",
+    "stream",
+    "role",
+    "is_elective",
+    "num_students",
+)
+
+
 class TeacherDB:
     def __init__(self):
         self.db: dict[str, Teacher] = {}
+        self._teacher_pos: dict[str, int] = {}
+        self._group_index: dict[Group, _IndexEntries] = {}
+        self._stream_index: dict[Stream, _IndexEntries] = {}
+        self._spec_index: dict[Speciality, _IndexEntries] = {}
+        self._fact_table: Optional[pd.DataFrame] = None
+        self._num_students_matrices: dict[str, pd.DataFrame] = {}
 
     def append_from_group_dict(
         self,
@@ -286,6 +477,8 @@ class TeacherDB:
         }
         """
         group = info["group"]
+        self._fact_table = None
+        self._num_students_matrices = {}
         for teacher_info in info["teachers"]:
             teacher_name = teacher_info["name"].translate({"ʼ": "'", "`": "'"})
             total_students = teacher_info["num_students"]
@@ -313,12 +506,16 @@ class TeacherDB:
                             raise ValueError(
                                 f"Course {course.name} for group {group} has already been added"
                             )
-                        course.audiences.append(course2audience[course.name])
-                        del course2audience[course.name]
+                        audience = course2audience.pop(course.name)
+                        course.audiences.append(audience)
+                        course.invalidate_cache()
+                        self.__index_audience(teacher_name, audience)
                 for new_course_name, audience in course2audience.items():
+                    self.__index_audience(teacher_name, audience)
                     teacher.courses.append(
                         Course(name=new_course_name, audiences=[audience])
                     )
+                teacher.invalidate_cache()
             else:
                 courses = [
                     Course(name=name, audiences=[aud])
@@ -329,57 +526,431 @@ class TeacherDB:
                     courses=courses,
                     student_per_group={group: total_students},
                 )
+                self._teacher_pos.setdefault(teacher_name, len(self._teacher_pos))
+                for course in courses:
+                    self.__index_audience(teacher_name, course.audiences[0])
+
+            # register the group even if the teacher has no courses in it
+            self._group_index.setdefault(Group(group), {}).setdefault(teacher_name, 0)
+
+    def replace_groups(
+        self,
+        infos: Iterable[dict],
+        removed_groups: Iterable[str] = (),
+    ) -> "TeacherDB":
+        """
+        Return a new DB where all info about the groups from `infos` (in the
+        format of append_from_group_dict) and `removed_groups` is replaced with
+        the one from `infos`. The current DB is left untouched and shares
+        all teachers not related to these groups with the new one, so the cost
+        depends only on the size of the change.
+        """
+        infos = list(infos)
+        groups = set(removed_groups).union(info["group"] for info in infos)
+
+        affected: set[str] = set()
+        for group in groups:
+            affected.update(self._group_index.get(Group(group), ()))
+        for info in infos:
+            affected.update(
+                t_info["name"].translate({"ʼ": "'", "`": "'"})
+                for t_info in info["teachers"]
+            )
+
+        new_db = TeacherDB()
+        new_db.db = dict(self.db)
+        new_db._teacher_pos = dict(self._teacher_pos)
+        for name in ("_group_index", "_stream_index", "_spec_index"):
+            setattr(new_db, name, dict(getattr(self, name)))
+
+        # copy on write all index entries where affected teachers are present
+        touched_keys: list[tuple[dict, Group | Stream | Speciality]] = []
+        for group in groups:
+            group = Group(group)
+            touched_keys.append((new_db._group_index, group))
+            touched_keys.append((new_db._stream_index, group.stream))
+            touched_keys.append((new_db._spec_index, group.speciality))
+        for name in affected & self.db.keys():
+            for gname in self.db[name].student_per_group:
+                group = Group(gname)
+                touched_keys.append((new_db._group_index, group))
+                touched_keys.append((new_db._stream_index, group.stream))
+                touched_keys.append((new_db._spec_index, group.speciality))
+        for index, key in touched_keys:
+            if key not in index:
+                continue
+            entries = {n: e for n, e in index[key].items() if n not in affected}
+            if entries:
+                index[key] = entries
+            else:
+                del index[key]
+
+        for name in affected & self.db.keys():
+            teacher = self.db[name]
+            student_per_group = {
+                g: n for g, n in teacher.student_per_group.items() if g not in groups
+            }
+            if not student_per_group:
+                del new_db.db[name]
+                continue
+
+            courses = []
+            for course in teacher.courses:
+                auds = [aud for aud in course.audiences if aud.group.name not in groups]
+                if auds:
+                    courses.append(Course(course.name, audiences=auds))
+            new_db.db[name] = Teacher(name, courses, student_per_group)
+            for gname in student_per_group:
+                new_db._group_index.setdefault(Group(gname), {}).setdefault(name, 0)
+            for aud in new_db.db[name].audiences():
+                new_db.__index_audience(name, aud)
+
+        for info in infos:
+            new_db.append_from_group_dict(info)
+
+        return new_db
+
+    def __index_audience(self, teacher_name: str, aud: Audience) -> None:
+        for index, key in (
+            (self._group_index, aud.group),
+            (self._stream_index, aud.stream),
+            (self._spec_index, aud.speciality),
+        ):
+            entries = index.setdefault(key, {})
+            entries[teacher_name] = entries.get(teacher_name, 0) + 1
 
     def __getitem__(self, name: str) -> Teacher:
         return self.db[name]
 
     def get_all_groups(self) -> Iterable[Group]:
-        return set(chain.from_iterable(teacher.groups for teacher in self))
+        return self._group_index.keys()
 
     def get_all_specialities(self) -> Iterable[Speciality]:
-        return set(chain.from_iterable(teacher.specialities for teacher in self))
+        return self._spec_index.keys()
 
     def get_all_streams(self) -> Iterable[Stream]:
-        return set(chain.from_iterable(teacher.streams for teacher in self))
+        return self._stream_index.keys()
 
-    def __filter_by(self, predicate: Callable[[Audience], bool]) -> Iterable[Teacher]:
-        for teacher in self.db.values():
-            filtered_courses = []
-            group_names = set()
-            for course in teacher.courses:
-                auds = list(filter(predicate, course.audiences))
-                if auds:
-                    filtered_courses.append(Course(course.name, audiences=auds))
-                    group_names = group_names.union(aud.group.name for aud in auds)
-            if filtered_courses:
-                new_num_stud = {g: teacher.student_per_group[g] for g in group_names}
-                yield Teacher(teacher.name, filtered_courses, new_num_stud)
+    def __filter_by(
+        self,
+        entries: Optional[_IndexEntries],
+        predicate: Callable[[Audience], bool],
+    ) -> Iterable[Teacher]:
+        if not entries:
+            return
+
+        for name in sorted(entries, key=self._teacher_pos.__getitem__):
+            if entries[name]:
+                yield TeacherView(self.db[name], predicate)
 
     def filter_by_group(self, group: str | Group) -> Iterable[Teacher]:
         if isinstance(group, str):
-            yield from self.__filter_by(lambda aud: aud.group.name == group)
-        else:
-            yield from self.__filter_by(lambda aud: aud.group == group)
+            group = Group.lookup(group)
+            if group is None:
+                return
+        yield from self.__filter_by(
+            self._group_index.get(group), lambda aud: aud.group is group
+        )
 
     def filter_by_speciality(self, speciality: Speciality) -> Iterable[Teacher]:
-        yield from self.__filter_by(lambda aud: aud.speciality == speciality)
+        yield from self.__filter_by(
+            self._spec_index.get(speciality), lambda aud: aud.speciality == speciality
+        )
 
     def filter_by_stream(self, stream: Stream) -> Iterable[Teacher]:
-        yield from self.__filter_by(lambda aud: aud.stream == stream)
+        yield from self.__filter_by(
+            self._stream_index.get(stream), lambda aud: aud.stream is stream
+        )
+
+    def fact_table(self) -> pd.DataFrame:
+        """
+        Columnar representation of the DB with one row per audience:
+        teacher, course, group, speciality, year, stream, role, is_elective,
+        num_students. `role` holds the integer value of the Role flag and
+        `num_students` is the number of students of the teacher in the group.
+        """
+        if self._fact_table is not None:
+            return self._fact_table
+
+        columns: dict[str, list] = {col: [] for col in _fact_columns}
+        for teacher in self.db.values():
+            for course in teacher.courses:
+                for aud in course.audiences:
+                    columns["teacher"].append(teacher.name)
+                    columns["course"].append(course.name)
+                    columns["group"].append(aud.group.name)
+                    columns["speciality"].append(aud.speciality.value)
+                    columns["year"].append(aud.enrollment_year)
+                    columns["stream"].append(str(aud.stream))
+                    columns["role"].append(aud.role.value)
+                    columns["is_elective"].append(aud.is_elective)
+                    columns["num_students"].append(
+                        teacher.student_per_group[aud.group.name]
+                    )
+
+        table = pd.DataFrame(columns)
+        for col in ("teacher", "course", "group", "speciality", "year", "stream"):
+            table[col] = table[col].astype("category")
+        self._fact_table = table
+        return table
+
+    def num_students_matrix(self, by: _EntityColumn) -> pd.DataFrame:
+        """
+        Teacher x entity matrix of the number of students, i.e.
+        num_students_for_group/stream/spec/enrollment_year for all pairs at once
+        """
+        matrix = self._num_students_matrices.get(by)
+        if matrix is None:
+            table = self.fact_table().drop_duplicates(["teacher", "group"])
+            matrix = table.pivot_table(
+                index="teacher",
+                columns=by,
+                values="num_students",
+                aggfunc="sum",
+                fill_value=0,
+                observed=True,
+            )
+            self._num_students_matrices[by] = matrix
+        return matrix
+
+    def num_students_for(
+        self,
+        teacher_name: str,
+        by: _EntityColumn,
+        entity: Group | Stream | Speciality | str,
+    ) -> int:
+        """A cell of num_students_matrix, 0 if the teacher has no such audience"""
+        key = entity.value if isinstance(entity, Speciality) else str(entity)
+        try:
+            return int(self.num_students_matrix(by).at[teacher_name, key])
+        except KeyError:
+            return 0
+
+    def overall_role_matrix(self, by: _EntityColumn) -> pd.DataFrame:
+        """
+        Teacher x entity matrix of the OR-reduced Role values, i.e.
+        overall_role_for_* for all pairs at once. 0 means that the teacher
+        doesn't teach the entity
+        """
+        roles = (
+            self.fact_table()
+            .groupby(["teacher", by], observed=True)["role"]
+            .agg(np.bitwise_or.reduce)
+        )
+        return roles.unstack(fill_value=0)
 
     def __iter__(self) -> Iterator[Teacher]:
         return iter(self.db.values())
 
 
-def load_teachers_db(json_files: list[str]) -> TeacherDB:
-    teacher_db = TeacherDB()
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TEACHERS_DB_CACHE_DIR", os.path.join(".cache", "teachers_db")
+)
+# bump when the layout of pickled classes changes, snapshots are also keyed
+# by the source of this module so that a forgotten bump is not fatal
+_SNAPSHOT_VERSION = 2
+
+
+def load_teachers_db(
+    json_files: list[str], cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+) -> TeacherDB:
+    """
+    Build TeacherDB from json files with group info. If `cache_dir` is set
+    the built DB is stored there as a snapshot keyed by the paths and the
+    content hashes of the input files and is loaded directly when none of
+    them have changed. Only the latest snapshot of every set of paths is kept.
+    """
+    start = time.perf_counter()
+    contents = []
     for path in json_files:
-        with open(path) as file:
-            info = json.load(file)
-            if isinstance(info, dict):
-                info = [info]
+        with open(path, "rb") as file:
+            contents.append(file.read())
+
+    if not cache_dir:
+        return _build_teachers_db(contents)
+
+    digest = hashlib.sha256(str(_SNAPSHOT_VERSION).encode())
+    digest.update(_module_digest())
+    for content in contents:
+        digest.update(hashlib.sha256(content).digest())
+    # snapshots of the same set of input files share the prefix
+    inputs = "\n".join(sorted(os.path.abspath(path) for path in json_files))
+    prefix = hashlib.sha256(inputs.encode()).hexdigest()[:16]
+    snapshot_path = os.path.join(cache_dir, f"{prefix}-{digest.hexdigest()}.pkl")
+
+    if os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path, "rb") as file:
+                teacher_db = pickle.load(file)
+            logger.info(
+                "Teachers DB cache hit: loaded %s in %.3fs",
+                snapshot_path,
+                time.perf_counter() - start,
+            )
+            return teacher_db
+        except Exception:
+            # any incompatible or corrupt snapshot is just rebuilt
+            logger.exception("Failed to load teachers DB snapshot %s", snapshot_path)
+
+    teacher_db = _build_teachers_db(contents)
+    logger.info(
+        "Teachers DB cache miss: rebuilt from %d files in %.3fs",
+        len(json_files),
+        time.perf_counter() - start,
+    )
+
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            pickle.dump(teacher_db, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except (OSError, pickle.PicklingError) as e:
+        logger.warning("Failed to save teachers DB snapshot %s: %s", snapshot_path, e)
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return teacher_db
+
+    _prune_snapshots(cache_dir, prefix, keep=snapshot_path)
+    return teacher_db
+
+
+@lru_cache(maxsize=1)
+def _module_digest() -> bytes:
+    with open(__file__, "rb") as file:
+        return hashlib.sha256(file.read()).digest()
+
+
+def _prune_snapshots(cache_dir: str, prefix: str, keep: str) -> None:
+    """Remove snapshots of previous versions of the same input files"""
+    for entry in os.scandir(cache_dir):
+        if (
+            entry.name.startswith(f"{prefix}-")
+            and entry.name.endswith(".pkl")
+            and entry.path != keep
+        ):
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning("Failed to remove stale snapshot %s: %s", entry.path, e)
 
-            for item in info:
-                teacher_db.append_from_group_dict(item)
+
+@dataclass
+class _FileState:
+    stat: tuple[int, int]
+    digest: bytes
+    groups: list[str]
+
+
+class TeacherDBReloader:
+    """
+    Tracks json files with group info and produces an updated TeacherDB
+    where only the groups from changed files are replaced. Every group is
+    expected to be described in a single file.
+    """
+
+    def __init__(self, json_files: list[str], teachers_db: TeacherDB):
+        self.json_files = json_files
+        self.teachers_db = teachers_db
+        self._states: dict[str, Optional[_FileState]] = {}
+        for path in json_files:
+            stat = os.stat(path)
+            with open(path, "rb") as file:
+                content = file.read()
+            self._states[path] = _FileState(
+                stat=(stat.st_mtime_ns, stat.st_size),
+                digest=hashlib.sha256(content).digest(),
+                groups=[item["group"] for item in _parse_group_infos(content)],
+            )
+
+    def poll(self) -> Optional[TeacherDB]:
+        """
+        Check files for changes and return the new DB if there are any.
+        The previously returned DB is never modified.
+        """
+        start = time.perf_counter()
+        infos: list[dict] = []
+        removed_groups: set[str] = set()
+        new_states: dict[str, Optional[_FileState]] = {}
+
+        for path in self.json_files:
+            prev_state = self._states[path]
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if prev_state is not None:
+                    removed_groups.update(prev_state.groups)
+                    new_states[path] = None
+                continue
+
+            file_stat = (stat.st_mtime_ns, stat.st_size)
+            if prev_state is not None and prev_state.stat == file_stat:
+                continue
+
+            with open(path, "rb") as file:
+                content = file.read()
+            digest = hashlib.sha256(content).digest()
+            if prev_state is not None and prev_state.digest == digest:
+                prev_state.stat = file_stat
+                continue
+
+            try:
+                file_infos = _parse_group_infos(content)
+            except json.JSONDecodeError as e:
+                logger.warning("Skip reloading of %s: %s", path, e)
+                continue
+
+            groups = [item["group"] for item in file_infos]
+            if prev_state is not None:
+                removed_groups.update(set(prev_state.groups).difference(groups))
+            infos.extend(file_infos)
+            new_states[path] = _FileState(file_stat, digest, groups)
+
+        if not new_states:
+            return None
+
+        try:
+            teachers_db = self.teachers_db.replace_groups(infos, removed_groups)
+        except Exception:
+            logger.exception("Failed to reload teachers DB from changed files")
+            for path, state in new_states.items():
+                if state is not None and self._states[path] is not None:
+                    self._states[path].stat = state.stat
+            return None
+
+        self._states.update(new_states)
+        self.teachers_db = teachers_db
+        logger.info(
+            "Teachers DB reloaded: %d changed files, %d groups in %.3fs",
+            len(new_states),
+            len(infos) + len(removed_groups),
+            time.perf_counter() - start,
+        )
+        return teachers_db
+
+
+async def reload_teachers_db(context) -> None:
+    """
+    Job queue callback for the bots: replaces bot_data["teachers_db"] when
+    the reloader stored in bot_data["teachers_db_reloader"] finds changes
+    """
+    reloader: TeacherDBReloader = context.bot_data["teachers_db_reloader"]
+    teachers_db = reloader.poll()
+    if teachers_db is not None:
+        context.bot_data["teachers_db"] = teachers_db
+
+
+def _parse_group_infos(content: bytes) -> list[dict]:
+    info = json.loads(content)
+    if isinstance(info, dict):
+        info = [info]
+    return info
+
+
+def _build_teachers_db(contents: list[bytes]) -> TeacherDB:
+    teacher_db = TeacherDB()
+    for content in contents:
+        for item in _parse_group_infos(content):
+            teacher_db.append_from_group_dict(item)
 
     return teacher_db
@@ -1,4 +1,5 @@
 import argparse
+import logging
 from enum import Enum
 from itertools import product
 from typing import Any
@@ -73,3 +74,38 @@ class ParseStreamAction(argparse.Action):
             raise argparse.ArgumentTypeError()
 
         setattr(namespace, self.dest, Stream(speciality, year_str))
+
+
+def add_fake_api_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--fake_api",
+        action="store_true",
+        help="Use local in-memory fake of Forms and Drive APIs (for benchmarks)",
+    )
+    parser.add_argument(
+        "--fake_latency",
+        type=float,
+        default=0.3,
+        help="Mean latency of fake API calls in seconds",
+    )
+    parser.add_argument(
+        "--fake_error_rate",
+        type=float,
+        default=0.0,
+        help="Fraction of fake API calls which fail with 429 or 503",
+    )
+    parser.add_argument(
+        "--fake_quota_scale",
+        type=float,
+        default=0.0,
+        help="Multiplier of API quotas used to pace fake API calls "
+        "(default 0 disables pacing)",
+    )
+
+
+def configure_logging() -> None:
+    """Show info logs of the package (e.g. teachers DB cache timings)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
@@ -0,0 +1,93 @@
+import json
+import os
+import random
+from dataclasses import dataclass
+
+from src.teachers_db import Role
+
+_group_prefixes = ("ФІ", "ФФ", "ФБ", "ФЕ")
+
+
+@dataclass(frozen=True)
+class FacultyConfig:
+    num_groups: int = 30
+    num_teachers: int = 120
+    num_courses: int = 150
+    teachers_per_group: int = 10
+    max_courses_per_teacher: int = 3
+    elective_fraction: float = 0.2
+    # weights of Role.LECTURER, Role.PRACTICE, Role.BOTH
+    role_weights: tuple[float, float, float] = (0.3, 0.4, 0.3)
+    min_students: int = 5
+    max_students: int = 30
+    seed: int = 0
+
+    def scaled(self, factor: int) -> "FacultyConfig":
+        return FacultyConfig(
+            num_groups=self.num_groups * factor,
+            num_teachers=self.num_teachers * factor,
+            num_courses=self.num_courses * factor,
+            teachers_per_group=self.teachers_per_group,
+            max_courses_per_teacher=self.max_courses_per_teacher,
+            elective_fraction=self.elective_fraction,
+            role_weights=self.role_weights,
+            min_students=self.min_students,
+            max_students=self.max_students,
+            seed=self.seed,
+        )
+
+
+def generate_faculty(cfg: FacultyConfig) -> list[dict]:
+    """
+    Generate synthetic group infos in the format of
+    TeacherDB.append_from_group_dict. The result depends only on the config.
+    """
+    rnd = random.Random(cfg.seed)
+    roles = [str(Role.LECTURER), str(Role.PRACTICE), str(Role.BOTH)]
+    teachers = [f"Викладач{i} Ім'я{i} По-батькові{i}" for i in range(cfg.num_teachers)]
+    courses = [f"Дисципліна {i}" for i in range(cfg.num_courses)]
+
+    group_infos = []
+    for i in range(cfg.num_groups):
+        prefix = _group_prefixes[i % len(_group_prefixes)]
+        year = (i // len(_group_prefixes)) % 6 + 1
+        idx = i // (len(_group_prefixes) * 6) + 1
+        num_students = rnd.randint(cfg.min_students, cfg.max_students)
+
+        teachers_info = []
+        num_group_teachers = min(cfg.teachers_per_group, cfg.num_teachers)
+        for teacher in rnd.sample(teachers, num_group_teachers):
+            num_courses = rnd.randint(1, cfg.max_courses_per_teacher)
+            teacher_courses = [
+                {
+                    "name": course,
+                    "is_elective": rnd.random() < cfg.elective_fraction,
+                    "role": rnd.choices(roles, weights=cfg.role_weights)[0],
+                }
+                for course in rnd.sample(courses, num_courses)
+            ]
+            teachers_info.append(
+                {
+                    "name": teacher,
+                    "courses": teacher_courses,
+                    "num_students": rnd.randint(1, num_students),
+                }
+            )
+
+        group_infos.append(
+            {"group": f"{prefix}-{year}{idx}", "teachers": teachers_info}
+        )
+
+    return group_infos
+
+
+def write_faculty(group_infos: list[dict], out_dir: str) -> list[str]:
+    """Write every group info to a separate json file and return their paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for info in group_infos:
+        path = os.path.join(out_dir, f"{info['group']}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(info, file, ensure_ascii=False, indent=4)
+        paths.append(path)
+    return paths